@@ -3,11 +3,14 @@ import logging
 import os
 
 from flask import Flask
+from flask import current_app
 from flask_mail import Mail
 from flask_migrate import Migrate
 from flask_socketio import SocketIO
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CSRFProtect
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, raiseload
 
 from .config import Config
 
@@ -24,7 +27,16 @@ logger = logging.getLogger(__name__)
 import app.chats.events
 
 
-def make_app(test_config: object = None) -> Flask:
+@event.listens_for(db.session, 'do_orm_execute')
+def raise_on_lazy_load(orm_execute_state: ORMExecuteState):
+    """Makes every relationship, which is not loaded by the query options, raise an error on access instead of
+    emitting SQL, if SQLALCHEMY_RAISE_ON_LAZY_LOAD setting is enabled. So, N+1 queries are caught by tests"""
+    if orm_execute_state.is_select and not orm_execute_state.is_relationship_load \
+            and not orm_execute_state.is_column_load and current_app.config['SQLALCHEMY_RAISE_ON_LAZY_LOAD']:
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload('*', sql_only=True))
+
+
+def make_app(test_config: object = None, instance_path: str = None) -> Flask:
     """
     An application factory like in the official documentation.
     Creates and configures the main flask instance registering all the blueprints and additions.
@@ -38,10 +50,12 @@ def make_app(test_config: object = None) -> Flask:
     :param test_config: can be used to specify special settings for conducting tests.
                         If nothing is put, the function will load a production config if it exists.
     :type test_config: dict; some dict inheritance.
+    :param instance_path: absolute path of the instance folder, 'instance' folder next to the package by default
+    :type instance_path: str
     :returns: a new configured flask application instance.
     :rtype: Flask
     """
-    app = Flask(__name__, instance_relative_config=True)
+    app = Flask(__name__, instance_path=instance_path, instance_relative_config=True)
     app.config.from_object(Config)
     if test_config:
         app.config.from_object(test_config)
@@ -52,6 +66,12 @@ def make_app(test_config: object = None) -> Flask:
     if not app.config['LOGGING']:
         Config.disable_configured_loggers()
 
+    if not app.config['ARGON2_TIME_COST']:
+        from app.authentication.models import load_argon2_time_cost
+        app.config['ARGON2_TIME_COST'] = load_argon2_time_cost(app.instance_path, app.config['ARGON2_MEMORY_COST'],
+                                                               app.config['ARGON2_PARALLELISM'],
+                                                               app.config['PASSWORD_HASH_TARGET_MS'])
+
     db.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
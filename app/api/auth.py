@@ -41,8 +41,7 @@ class Register(Resource):
         elif User.query.filter_by(username=username).first():
             abort(400, message=f"Username '{username}' is busy! Try putting another one")
         else:
-            user = User(email=email, username=username, name=name)
-            user.set_password(password)
+            user = User(email=email, username=username, name=name, password_hash=User.hash_password(password))
             db.session.add(user)
             db.session.commit()
             return {'email': email, 'message': 'Successfully registered!'}, 201
@@ -99,6 +98,8 @@ class ResetPassword(Resource):
         user.set_password(password)
         db.session.add(user)
         db.session.commit()
+        User.forget_logged_in_user(user.user_id)
+        User.forget_login_credentials(user.email)
         return {'email': user.email, 'message': "Successfully reset"}, 202
 
 
@@ -132,6 +133,7 @@ class Update(Resource):
                 abort(400, message=error.message)
         db.session.add(user)
         db.session.commit()
+        User.forget_logged_in_user(user.user_id)
         result = {}
         if username:
             result['username'] = username
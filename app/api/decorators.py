@@ -7,6 +7,7 @@ from flask_restful import abort
 from itsdangerous import BadSignature, SignatureExpired
 from sqlalchemy import or_
 
+from app import db
 from app.authentication.models import User
 from . import logger
 
@@ -30,6 +31,9 @@ def basic_or_bearer_authorization_required(func):
                 logger.info("User put the wrong password")
                 abort(401, message='Wrong password! Try again')
             else:
+                if db.session.is_modified(user):
+                    db.session.commit()
+                    User.forget_login_credentials(user.email)
                 setattr(g, 'user', user)
                 return func(*args, **kwargs)
         else:
@@ -18,7 +18,7 @@ from app.api.utils import longer_than_zero
 
 message_fields = {
     'message_id': fields.Integer,
-    'datetime_writing': fields.DateTime(),
+    'datetime_writing': fields.DateTime(dt_format='iso8601'),
     'text': fields.String,
     'sender_id': fields.Integer,
     'receiver_id': fields.Integer,
@@ -1,11 +1,13 @@
 """Essential and repetitive utils for rest api views"""
 from typing import Any
 
+from flask import g
 from flask_restful import abort
 from flask_sqlalchemy import BaseQuery
 from flask_sqlalchemy.model import DefaultMeta
 from sqlalchemy import desc
 from sqlalchemy.engine.row import Row
+from sqlalchemy.orm import load_only
 from sqlalchemy.sql.sqltypes import String
 
 from app import db
@@ -119,9 +121,13 @@ def abort_if_not_own(user_id: int, message: Message):
 
 
 def return_user_or_abort(user_id: int) -> 'User':
-    """Returns user model instance if it exists, else - makes abort"""
+    """Returns user model instance if it exists, else - makes abort. Only public columns are fetched, the rest of them
+    are loaded on the first access. If the current authorized user is requested, he is returned without a query"""
+    current_user = getattr(g, 'user', None)
+    if current_user is not None and current_user.user_id == user_id:
+        return current_user
     try:
-        return User.get_user_by_id(user_id)
+        return User.get_user_by_id(user_id, load_only(User.user_id, User.username, User.name, User.date_joined))
     except UserNotFoundByIndexError:
         logger.info('Abort because user was not found')
         abort(404, message=f'User {user_id} does not exist')
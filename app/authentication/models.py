@@ -1,12 +1,24 @@
 """Main models to realize an authentication. Chats table is also specified here in order to prevent from circular
 import with app/chats/models.py"""
 import datetime
+import hashlib
+import os
+import threading
+import time
 from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
+import jwt
+from argon2 import PasswordHasher, extract_parameters
+from argon2.exceptions import VerificationError, InvalidHash
+from cachetools import LRUCache, TTLCache
+from eventlet import patcher, tpool
 from flask import current_app
-from itsdangerous import TimedJSONWebSignatureSerializer
-from sqlalchemy import and_, exists
-from werkzeug.security import generate_password_hash, check_password_hash
+from itsdangerous import BadSignature, SignatureExpired
+from sqlalchemy import and_, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only, make_transient_to_detached
+from werkzeug.security import check_password_hash
 
 from app import db
 from app.authentication.email import send_mail
@@ -17,7 +29,169 @@ from . import logger
 chats = db.Table('chats',
                  db.Column('chat_id', db.Integer, primary_key=True),
                  db.Column('user1_id', db.Integer, db.ForeignKey('users.user_id'), nullable=False),
-                 db.Column('user2_id', db.Integer, db.ForeignKey('users.user_id'), nullable=False))
+                 db.Column('user2_id', db.Integer, db.ForeignKey('users.user_id'), nullable=False),
+                 db.Index('ix_chats_user1_user2', 'user1_id', 'user2_id', unique=True))
+
+# ascending pair of users ids -> id of the chat between them or None, if they have not had a chat
+chat_ids_cache = LRUCache(maxsize=4096)
+_chat_ids_cache_lock = threading.Lock()
+_missing = object()
+
+# id of a logged in user -> his instance. Entries live a second to serve bursts of requests without hitting DB
+logged_in_users_cache = TTLCache(maxsize=1024, ttl=1.0)
+_logged_in_users_cache_lock = threading.Lock()
+
+# email -> (user id, password hash) of a registered user. Entries are forgotten only in the process which changed
+# the user, so they live a few seconds to bound how long other workers may accept an old password
+login_credentials_cache = TTLCache(maxsize=8192, ttl=5)
+_login_credentials_cache_lock = threading.Lock()
+
+# blake2b digest of an authentication token -> (user id, token expiration timestamp). Raw tokens are not kept
+authentication_tokens_cache = TTLCache(maxsize=16384, ttl=60)
+_authentication_tokens_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _get_password_hasher(time_cost: int, memory_cost: int, parallelism: int) -> PasswordHasher:
+    """Return argon2 hasher with given parameters. It is built only once for each set of them"""
+    return PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Return argon2 hasher configured by the current application's settings"""
+    config = current_app.config
+    return _get_password_hasher(config['ARGON2_TIME_COST'], config['ARGON2_MEMORY_COST'], config['ARGON2_PARALLELISM'])
+
+
+def _run_off_event_loop(func: Callable, *args) -> Any:
+    """Calls the CPU heavy function in eventlet's pool of OS threads, if the application is served by eventlet, so
+    that the event loop serves other greenlets meanwhile. Otherwise the function is called in place: password hashing
+    releases GIL, so request threads already compute hashes in parallel"""
+    if patcher.is_monkey_patched('thread'):
+        return tpool.execute(func, *args)
+    return func(*args)
+
+
+def _norm(user1_id: int, user2_id: int) -> Tuple[int, int]:
+    """Return given users ids in ascending order, like they are kept in chats table and chats cache"""
+    return (user1_id, user2_id) if user1_id <= user2_id else (user2_id, user1_id)
+
+
+def _get_chat_ids(keys: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], Optional[int]]:
+    """Return ids of the chats between given ascending pairs of users ids, None for the pairs without a chat.
+    The pairs, which are not cached yet, are looked up by one query with `(user1_id, user2_id) IN (...)` clause
+    instead of a query per pair, and the results warm up the cache"""
+    with _chat_ids_cache_lock:
+        result = {key: chat_ids_cache.get(key, _missing) for key in keys}
+    not_cached = [key for key, chat_id in result.items() if chat_id is _missing]
+    if not_cached:
+        found = {(row.user1_id, row.user2_id): row.chat_id for row in
+                 db.session.query(chats.c.user1_id, chats.c.user2_id, chats.c.chat_id).filter(
+                     tuple_(chats.c.user1_id, chats.c.user2_id).in_(not_cached))}
+        with _chat_ids_cache_lock:
+            for key in not_cached:
+                chat_ids_cache[key] = result[key] = found.get(key)
+    return result
+
+
+def _encode_token(user_id: int, expires_in: int) -> str:
+    """Makes HS256 json web token signed by the application secret key, which keeps user's id and expires after
+    given number of seconds"""
+    return jwt.encode({'user_id': user_id, 'exp': int(time.time()) + expires_in}, current_app.config['SECRET_KEY'],
+                      algorithm='HS256')
+
+
+def _decode_token(token: str) -> dict:
+    """Checks the token made by :func:`_encode_token` and returns its claims: user's id and expiration timestamp.
+    Errors are converted into itsdangerous ones, which are handled by views, SignatureExpired or BadSignature"""
+    try:
+        return jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'],
+                          options={'require': ['exp', 'user_id']})
+    except jwt.ExpiredSignatureError as error:
+        raise SignatureExpired(str(error)) from error
+    except jwt.InvalidTokenError as error:
+        raise BadSignature(str(error)) from error
+
+
+@lru_cache(maxsize=None)
+def probe_argon2_time_cost(memory_cost: int, parallelism: int, target_ms: int) -> int:
+    """Measures how long argon2 hashing with one iteration takes on the current machine and returns the number of
+    iterations which makes hashing last about the target time. The probe runs only once for each set of parameters.
+    :param memory_cost: argon2 memory usage in KiB
+    :type memory_cost: int
+    :param parallelism: number of argon2 parallel threads
+    :type parallelism: int
+    :param target_ms: desired duration of a password hashing in milliseconds
+    :type target_ms: int
+    :return: argon2 time cost, at least 1
+    :rtype: int
+    """
+    password_hasher = PasswordHasher(time_cost=1, memory_cost=memory_cost, parallelism=parallelism)
+    password = os.urandom(16).hex()
+    elapsed_ms = []
+    for _ in range(3):
+        start = time.perf_counter()
+        password_hasher.hash(password)
+        elapsed_ms.append((time.perf_counter() - start) * 1000)
+    time_cost = max(1, round(target_ms / min(elapsed_ms)))
+    logger.info(f'argon2 time cost {time_cost} was chosen to hash passwords in about {target_ms} ms')
+    return time_cost
+
+
+def argon2_time_cost_path(directory: str, memory_cost: int, parallelism: int, target_ms: int) -> str:
+    """Path of the file keeping argon2 time cost probed for given parameters"""
+    return os.path.join(directory, f'argon2_time_cost_m{memory_cost}_p{parallelism}_{target_ms}ms')
+
+
+def load_argon2_time_cost(directory: str, memory_cost: int, parallelism: int, target_ms: int) -> int:
+    """Return argon2 time cost saved in the directory for given parameters. If it has not been saved yet, it is probed
+    by :func:`probe_argon2_time_cost` and saved, so that restarts and all the workers of the application hash passwords
+    with the same cost instead of measuring their own one. The file is published by a hard link, which fails if
+    another worker has saved the cost first, and then the cost of that worker is taken.
+    :param directory: directory to keep the file in, e.g. the application's instance folder
+    :type directory: str
+    :param memory_cost: argon2 memory usage in KiB
+    :type memory_cost: int
+    :param parallelism: number of argon2 parallel threads
+    :type parallelism: int
+    :param target_ms: desired duration of a password hashing in milliseconds
+    :type target_ms: int
+    :return: argon2 time cost, at least 1
+    :rtype: int
+    """
+    path = argon2_time_cost_path(directory, memory_cost, parallelism, target_ms)
+    try:
+        with open(path) as file:
+            return int(file.read())
+    except FileNotFoundError:
+        pass
+    time_cost = probe_argon2_time_cost(memory_cost, parallelism, target_ms)
+    temp_path = f'{path}.{os.getpid()}'
+    with open(temp_path, 'w') as file:
+        file.write(str(time_cost))
+    try:
+        os.link(temp_path, path)
+    except FileExistsError:
+        with open(path) as file:
+            time_cost = int(file.read())
+    finally:
+        os.remove(temp_path)
+    return time_cost
+
+
+def _is_hash_weaker(password_hasher: PasswordHasher, password_hash: str) -> bool:
+    """Whether the argon2 hash was made with a lower time or memory cost than the hasher uses, or with another argon2
+    variant. Hashes made with higher costs are not made weaker, so workers or machines with differently tuned costs do
+    not rehash passwords back and forth"""
+    parameters = extract_parameters(password_hash)
+    return parameters.type != password_hasher.type or parameters.time_cost < password_hasher.time_cost \
+        or parameters.memory_cost < password_hasher.memory_cost
+
+
+@lru_cache(maxsize=None)
+def _get_dummy_password_hash(password_hasher: PasswordHasher) -> str:
+    """Return a hash of random password made by given hasher. It is compared with passwords put for unknown emails"""
+    return password_hasher.hash(os.urandom(16).hex())
 
 
 class User(db.Model):
@@ -32,32 +206,154 @@ class User(db.Model):
     name = db.Column(db.String(20))
     password_hash = db.Column(db.String(255), nullable=False)
     date_joined = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    # chats table keeps users ids in ascending order, so a user's companions are split into two view only collections
+    higher_chat_partners = db.relationship('User', secondary=chats, primaryjoin=user_id == chats.c.user1_id,
+                                           secondaryjoin=user_id == chats.c.user2_id,
+                                           back_populates='lower_chat_partners', viewonly=True)
+    lower_chat_partners = db.relationship('User', secondary=chats, primaryjoin=user_id == chats.c.user2_id,
+                                          secondaryjoin=user_id == chats.c.user1_id,
+                                          back_populates='higher_chat_partners', viewonly=True)
+    messages_sent = db.relationship('Message', foreign_keys='Message.sender_id', back_populates='sender')
+    messages_received = db.relationship('Message', foreign_keys='Message.receiver_id', back_populates='receiver')
 
     @property
     def password(self):
         logger.warning("Someone tried to read user's password")
         raise AttributeError('Password cannot be read')
 
+    @property
+    def chat_partners(self) -> List['User']:
+        """All the users the current one has chats with"""
+        return self.lower_chat_partners + self.higher_chat_partners
+
     def set_password(self, password: str):
-        """Hashes user password using werkzeug method and saves it into the appropriate attribute"""
-        self.password_hash = generate_password_hash(password)
+        """Hashes user password using argon2 with the configured cost and saves it into the appropriate attribute"""
+        self.password_hash = User.hash_password(password)
+
+    @staticmethod
+    def hash_password(password: str) -> str:
+        """Hashes the password using argon2 with the configured cost without blocking eventlet's event loop. It must be
+        called only after all the checks of a request have passed, because hashing is deliberately expensive
+        :param password: raw password to hash
+        :type password: str
+        :return: the password hash
+        :rtype: str
+        """
+        return _run_off_event_loop(get_password_hasher().hash, password)
 
     def verify_password(self, password: str) -> bool:
-        """Makes hash from given password and compares it with already existing one. Uses werkzeug method."""
-        return check_password_hash(self.password_hash, password)
+        """Makes hash from given password and compares it with already existing one. Uses argon2 or werkzeug method
+        for the hashes which were made before. If the hash is outdated or made with lower costs than the configured
+        ones, the password is hashed again, so db.session must be committed after the successful verification"""
+        is_right, needs_rehash = User.verify_password_hash(self.password_hash, password)
+        if needs_rehash:
+            self.set_password(password)
+        return is_right
+
+    @staticmethod
+    def verify_password_hash(password_hash: str, password: str) -> Tuple[bool, bool]:
+        """Compares the password with given hash without a user instance.
+        :param password_hash: argon2 or werkzeug hash of the right password
+        :type password_hash: str
+        :param password: password to check
+        :type password: str
+        :return: whether the password is right and whether it must be hashed again, because the hash is outdated or
+            weaker
+        :rtype: Tuple[bool, bool]
+        """
+        if password_hash.startswith('pbkdf2:'):
+            is_right = _run_off_event_loop(check_password_hash, password_hash, password)
+            return is_right, is_right
+        password_hasher = get_password_hasher()
+        try:
+            _run_off_event_loop(password_hasher.verify, password_hash, password)
+        except (VerificationError, InvalidHash):
+            return False, False
+        return True, _is_hash_weaker(password_hasher, password_hash)
+
+    @staticmethod
+    def verify_dummy_password(password: str):
+        """Verifies the password against a hash of the random one. It is used when a user is not found, so that
+        the response takes the same time as for the existing one and e-mails cannot be enumerated by timing"""
+        User.verify_password_hash(_get_dummy_password_hash(get_password_hasher()), password)
+
+    @staticmethod
+    def get_login_credentials(email: str) -> Optional[Tuple[int, str]]:
+        """Return id and password hash of the user with given email or None, if there is no such a user.
+        Only these two columns are fetched and found credentials are cached for a few seconds. Absent emails are not
+        cached, so a user can log in right after the registration in another worker.
+        :param email: email put into login form
+        :type email: str
+        :return: user id and password hash or None
+        :rtype: Optional[Tuple[int, str]]
+        """
+        with _login_credentials_cache_lock:
+            credentials = login_credentials_cache.get(email)
+        if credentials is None:
+            credentials = db.session.query(User.user_id, User.password_hash).filter(User.email == email).first()
+            if credentials is None:
+                return None
+            credentials = tuple(credentials)
+            with _login_credentials_cache_lock:
+                login_credentials_cache[email] = credentials
+        return credentials
+
+    @staticmethod
+    def forget_login_credentials(email: str):
+        """Removes the email from the cache of login credentials. Must be executed when the user with such an email
+        changes the password. Absent emails are not cached, so nothing has to be forgotten after a registration"""
+        with _login_credentials_cache_lock:
+            login_credentials_cache.pop(email, None)
 
     def __repr__(self) -> str:
         return f'User - {self.username}'
 
     @classmethod
-    def get_user_by_id(cls, user_id: int) -> 'User':
-        """Return user with given id if exists, else - raise error"""
-        user = cls.query.get(user_id)
+    def get_user_by_id(cls, user_id: int, *options) -> 'User':
+        """Return user with given id if exists, else - raise error. Loader options, e.g. :func:`load_only`, can be put
+        after the id to restrict the columns which are fetched"""
+        user = cls.query.options(*options).get(user_id)
         if not user:
             logger.info('User was not found by index')
             raise UserNotFoundByIndexError
         return user
 
+    @classmethod
+    def get_logged_in_user(cls, user_id: int, *options) -> 'User':
+        """Works like :meth:`get_user_by_id`, but keeps the fetched columns of the user for a short period, so that
+        the next requests of the same user receive him without the DB round-trip. Only the columns, which are necessary
+        for the views, are fetched and cached as a plain dict, so the cache never shares an instance between sessions
+        and threads. A cached user is rebuilt as a detached instance and merged into the current session without
+        loading, the other columns are loaded lazily.
+        :param user_id: id of the user saved in the session
+        :type user_id: int
+        :param options: additional loader options applied when the user is fetched from DB
+        :return: User instance attached to the current session
+        :rtype: User
+        """
+        with _logged_in_users_cache_lock:
+            columns = logged_in_users_cache.get(user_id)
+        if columns is not None:
+            user = cls(**columns)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+        user = cls.get_user_by_id(user_id, load_only(*cls._logged_in_user_columns()), *options)
+        columns = {column.key: getattr(user, column.key) for column in cls._logged_in_user_columns()}
+        with _logged_in_users_cache_lock:
+            logged_in_users_cache[user_id] = columns
+        return user
+
+    @classmethod
+    def _logged_in_user_columns(cls) -> tuple:
+        return cls.user_id, cls.username, cls.email, cls.name, cls.date_joined
+
+    @staticmethod
+    def forget_logged_in_user(user_id: int):
+        """Removes the user from the cache of logged in users. Must be executed when user's data are changed or
+        the user logs out"""
+        with _logged_in_users_cache_lock:
+            logged_in_users_cache.pop(user_id, None)
+
     def send_email(self, subject: str, text: str):
         """Sends an e-mail with given subject and text to the current user"""
         send_mail(self.email, subject, text)
@@ -72,10 +368,7 @@ class User(db.Model):
         """
         if not expiration_period:
             expiration_period = current_app.config['PASSWORD_DEFAULT_EXPIRES_IN']
-        secret_key = current_app.config['SECRET_KEY']
-        serializer = TimedJSONWebSignatureSerializer(secret_key, expiration_period)
-        token = serializer.dumps({'user_id': self.user_id}).decode()
-        return token
+        return _encode_token(self.user_id, expiration_period)
 
     @classmethod
     def get_user_by_reset_password_token(cls, token: str) -> 'User':
@@ -86,26 +379,68 @@ class User(db.Model):
         :returns: user with received id
         :rtype User
         """
-        serializer = TimedJSONWebSignatureSerializer(current_app.config['SECRET_KEY'])
-        user_id = serializer.loads(token)['user_id']
-        return cls.get_user_by_id(user_id)
+        return cls.get_user_by_id(_decode_token(token)['user_id'])
 
     @staticmethod
     def create_chat(user1_id: int, user2_id: int):
         """Crete a note in chats table which connects two user in chat.
         Params can be given in an arbitrary order, so only ascending sequence of users ids will be saved to DB.
-        If a chats between given users already exists, error will be thrown.
+        If a chats between given users already exists, error will be thrown. The pair of ids is unique in DB, so
+        the chat is inserted without checking, and a violation of the unique index means that the chat exists.
         db.session must be committed after executing the function to save changes.
         :param user1_id: first user's id to check
         :param user2_id: second user's id to check"""
-        user1_id, user2_id = sorted([user1_id, user2_id])
-        if not User.is_chat_between(user1_id, user2_id):
-            db.session.execute(chats.insert(
-                values=[{'user1_id': user1_id, 'user2_id': user2_id}, ]))
-            User.is_chat_between.cache_clear()
-        else:
-            logger.info("Chat already exists when create_chat method is executed")
-            raise ChatAlreadyExistsError
+        key = user1_id, user2_id = _norm(user1_id, user2_id)
+        with _chat_ids_cache_lock:
+            chat_id = chat_ids_cache.get(key)
+        if chat_id is None:
+            try:
+                with db.session.begin_nested():
+                    result = db.session.execute(chats.insert().values(user1_id=user1_id, user2_id=user2_id))
+            except IntegrityError:
+                with _chat_ids_cache_lock:
+                    chat_ids_cache.pop(key, None)
+                if User.get_chat_id_or_none(user1_id, user2_id) is None:
+                    raise
+            else:
+                with _chat_ids_cache_lock:
+                    chat_ids_cache[key] = result.inserted_primary_key[0]
+                return
+        logger.info("Chat already exists when create_chat method is executed")
+        raise ChatAlreadyExistsError
+
+    @staticmethod
+    def create_chats_bulk(pairs: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], int]:
+        """
+        Creates chats between many pairs of users by one multi-row insert instead of a statement per chat. Ids inside
+        pairs can be in an arbitrary order, duplicated pairs are created once. If any of the chats already exists,
+        nothing is created and error is thrown. Ids of the new chats are fetched by one query and warm up the cache.
+        db.session must be committed after executing the function to save changes.
+        :param pairs: pairs of users ids to connect in chats
+        :type pairs: Iterable[Tuple[int, int]]
+        :return: dict, where each ascending pair of users ids matches the id of the chat created between them
+        :rtype: Dict[Tuple[int, int], int]
+        """
+        keys = list(dict.fromkeys(_norm(*pair) for pair in pairs))
+        if not keys:
+            return {}
+        with _chat_ids_cache_lock:
+            is_any_cached = any(chat_ids_cache.get(key) is not None for key in keys)
+            if not is_any_cached:
+                for key in keys:
+                    chat_ids_cache.pop(key, None)
+        if not is_any_cached:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(chats.insert().values([{'user1_id': user1_id, 'user2_id': user2_id}
+                                                              for user1_id, user2_id in keys]))
+            except IntegrityError:
+                if all(chat_id is None for chat_id in _get_chat_ids(keys).values()):
+                    raise
+            else:
+                return _get_chat_ids(keys)
+        logger.info("Chat already exists when create_chats_bulk method is executed")
+        raise ChatAlreadyExistsError
 
     @staticmethod
     def delete_chat(two_users_ids: list = None, chat_id: int = None):
@@ -118,25 +453,66 @@ class User(db.Model):
         :param chat_id: the chat, which will be deleted
         :type chat_id: int
         """
-        chat_id = chat_id or User.get_chat_id_by_users_ids(*two_users_ids)
+        if not chat_id:
+            key = _norm(*two_users_ids)
+            chat_id = User.get_chat_id_by_users_ids(*key)
+        else:
+            key = db.session.query(chats.c.user1_id, chats.c.user2_id).filter(chats.c.chat_id == chat_id).first()
         db.session.execute(chats.delete().where(chats.c.chat_id == chat_id))
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
+        if key:
+            with _chat_ids_cache_lock:
+                chat_ids_cache.pop(tuple(key), None)
+
+    @staticmethod
+    def get_chat_id_or_none(user1_id: int, user2_id: int) -> Optional[int]:
+        """
+        Return id of the chat between two given users or None if they have not had a chat. The result is cached by
+        the ascending pair of ids, so the repeated lookups, including the ones for absent chats, do not hit DB.
+        The cache is bounded and its entries are invalidated one by one when chats are created or deleted.
+        :param user1_id: first user's id.
+        :type user1_id: int
+        :param user2_id: second user's id.
+        :type user2_id: int
+        :return: chat id or None
+        :rtype: Optional[int]
+        """
+        key = _norm(user1_id, user2_id)
+        with _chat_ids_cache_lock:
+            chat_id = chat_ids_cache.get(key, _missing)
+        if chat_id is _missing:
+            chat_id = db.session.query(chats.c.chat_id).filter(
+                and_(chats.c.user1_id == key[0], chats.c.user2_id == key[1])).scalar()
+            with _chat_ids_cache_lock:
+                chat_ids_cache[key] = chat_id
+        return chat_id
+
+    @staticmethod
+    def chats_between_many(user_id: int, other_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+        """
+        Works like :meth:`get_chat_id_or_none` but for many companions at once. All the pairs which are not cached yet
+        are looked up by one query with `(user1_id, user2_id) IN (...)` clause instead of a query per pair, and the
+        results warm up the cache.
+        :param user_id: the user whose chats are looked up
+        :type user_id: int
+        :param other_ids: ids of potential companions
+        :type other_ids: Iterable[int]
+        :return: dict, where each companion's id matches the chat id or None, if there is no chat between users
+        :rtype: Dict[int, Optional[int]]
+        """
+        keys = {other_id: _norm(user_id, other_id) for other_id in other_ids}
+        chat_ids = _get_chat_ids(keys.values())
+        return {other_id: chat_ids[key] for other_id, key in keys.items()}
 
     @staticmethod
-    @lru_cache(maxsize=256)
     def is_chat_between(user1_id: int, user2_id: int) -> bool:
         """Check if two users have chat together.
         :param user1_id: first user's id to check
         :param user2_id: second user's id to check
         :returns boolean value: if it is true, users have already had chat together.
         If it is false - they have not had"""
-        user1_id, user2_id = sorted([user1_id, user2_id])
-        return db.session.query(
-            exists(chats).where(and_(chats.c.user1_id == user1_id, chats.c.user2_id == user2_id))).scalar()
+        return User.get_chat_id_or_none(user1_id, user2_id) is not None
 
     @staticmethod
-    @lru_cache(maxsize=256)
     def get_chat_id_by_users_ids(user1_id: int, user2_id: int) -> int:
         """
         Return a unique chat's id which connects two users from given ids. If a chat does not exist, raises error.
@@ -147,9 +523,7 @@ class User(db.Model):
         :return: chat id
         :rtype:int
         """
-        user1_id, user2_id = sorted([user1_id, user2_id])
-        chat_id = db.session.query(chats.c.chat_id).filter(
-            and_(chats.c.user1_id == user1_id, chats.c.user2_id == user2_id)).scalar()
+        chat_id = User.get_chat_id_or_none(user1_id, user2_id)
         if not chat_id:
             logger.warning('Chat must be found by index, but it is not')
             raise ChatNotFoundByIndexesError
@@ -167,19 +541,29 @@ class User(db.Model):
         """
         if not expires_in:
             expires_in = current_app.config['AUTHENTICATION_TOKEN_DEFAULT_EXPIRES_IN']
-        serializer = TimedJSONWebSignatureSerializer(current_app.config['SECRET_KEY'], expires_in)
-        return serializer.dumps({'user_id': self.user_id}).decode()
+        return _encode_token(self.user_id, expires_in)
 
     @staticmethod
     def get_user_by_authentication_token(token: str) -> 'User':
         """
         Deserializes the token and returns a user who matches the received id. Raises BadSignature or SignatureExpired
         errors if necessary. After that a user who are trying to access must be refused.
+        Verified tokens are cached for a minute by their digest, so the repeated requests with the same token only
+        check its expiration. The user is taken through the cache of logged in users.
         :param token: token string received from a client.
         :type token: str
         :return: User instance
         :rtype: User
         """
-        serializer = TimedJSONWebSignatureSerializer(current_app.config['SECRET_KEY'])
-        user_id = serializer.loads(token)['user_id']
-        return User.get_user_by_id(user_id)
+        key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        with _authentication_tokens_cache_lock:
+            claims = authentication_tokens_cache.get(key)
+        if claims is None:
+            payload = _decode_token(token)
+            claims = payload['user_id'], payload['exp']
+            with _authentication_tokens_cache_lock:
+                authentication_tokens_cache[key] = claims
+        user_id, expiration = claims
+        if int(expiration) < int(time.time()):
+            raise SignatureExpired('Signature has expired')
+        return User.get_logged_in_user(user_id)
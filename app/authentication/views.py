@@ -21,9 +21,12 @@ from app.authentication.validators import validate_length
 @auth_bp.before_app_request
 def recognize_logged_in_user():
     """Before each request to the server the function takes user id from the session, receives user instance by the id
-    and add him to flask application context variable. So, each view has an access to the current logged in user"""
+    and add him to flask application context variable. So, each view has an access to the current logged in user.
+    The user is cached for a short period, so that bursts of requests do not hit DB"""
     current_user_id = session.get('current_user_id')
-    user = User.get_user_by_id(current_user_id) if current_user_id is not None else None
+    user = None
+    if current_user_id is not None:
+        user = User.get_logged_in_user(current_user_id)
     setattr(g, 'user', user)
 
 
@@ -43,15 +46,24 @@ class LoginView(MethodView):
         """
         email = request.form['email']
         password = request.form['password']
-        user = User.query.filter_by(email=email).first()
-        if not user:
+        credentials = User.get_login_credentials(email)
+        if not credentials:
+            User.verify_dummy_password(password)
             flash('Wrong email! Maybe, you have not registered')
-        elif not user.verify_password(password):
-            flash('Wrong password! Try again')
         else:
-            flash('Successfully logged in!')
-            session['current_user_id'] = user.user_id
-            return redirect(request.args.get('next') or url_for('view.index'))
+            user_id, password_hash = credentials
+            is_right, needs_rehash = User.verify_password_hash(password_hash, password)
+            if not is_right:
+                flash('Wrong password! Try again')
+            else:
+                if needs_rehash:
+                    user = User.get_user_by_id(user_id)
+                    user.set_password(password)
+                    db.session.commit()
+                    User.forget_login_credentials(email)
+                flash('Successfully logged in!')
+                session['current_user_id'] = user_id
+                return redirect(request.args.get('next') or url_for('view.index'))
 
         return render_template('authentication/login.html')
 
@@ -88,8 +100,7 @@ class RegisterView(MethodView):
         elif User.query.filter_by(username=username).first():
             flash('This username is busy! Try putting another one')
         else:
-            user = User(email=email, username=username, name=name)
-            user.set_password(password2)
+            user = User(email=email, username=username, name=name, password_hash=User.hash_password(password2))
             db.session.add(user)
             db.session.commit()
             flash('Successfully registered!')
@@ -142,16 +153,19 @@ class ResetPasswordView(MethodView):
         """Receives new user password and save it"""
         password1 = request.form['password1']
         password2 = request.form['password2']
-        user = User.get_user_by_reset_password_token(token)
         try:
             validate_equal_passwords(password1, password2)
             validate_password_length(password2)
         except ValidationError as error:
             flash(error.message)
-            return render_template('authentication/reset_password.html', user=user)
-        user.set_password(password2)
+            return render_template('authentication/reset_password.html',
+                                   user=User.get_user_by_reset_password_token(token))
+        user = User.get_user_by_reset_password_token(token)
+        user.password_hash = User.hash_password(password2)
         db.session.add(user)
         db.session.commit()
+        User.forget_logged_in_user(user.user_id)
+        User.forget_login_credentials(user.email)
         flash('You password was successfully reset')
         return redirect(url_for('authentication.login'))
 
@@ -159,6 +173,9 @@ class ResetPasswordView(MethodView):
 @auth_bp.route('/logout')
 def logout():
     """Clears user`s id from session"""
+    current_user_id = session.get('current_user_id')
+    if current_user_id is not None:
+        User.forget_logged_in_user(current_user_id)
     session.clear()
     flash('Successfully logged out')
     return redirect(url_for('view.index'))
@@ -6,7 +6,7 @@ from sqlalchemy import delete
 from app import db
 from app.authentication.models import User
 from . import logger
-from .exceptions import MessageNotFoundByIndexError
+from .exceptions import ChatAlreadyExistsError, MessageNotFoundByIndexError
 
 
 class Message(db.Model):
@@ -20,15 +20,19 @@ class Message(db.Model):
     sender_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     chat_id = db.Column(db.Integer, db.ForeignKey('chats.chat_id'), nullable=False)
-    sender = db.relationship('User', foreign_keys=[sender_id], backref='messages_sent')
-    receiver = db.relationship('User', foreign_keys=[receiver_id], backref='messages_received')
+    sender = db.relationship('User', foreign_keys=[sender_id], back_populates='messages_sent')
+    receiver = db.relationship('User', foreign_keys=[receiver_id], back_populates='messages_received')
 
     def __init__(self, *args, **kwargs):
         sender_id = kwargs.get('sender_id')
         receiver_id = kwargs.get('receiver_id')
         if not User.is_chat_between(sender_id, receiver_id):
             logger.info('Message __init__ is making a chat between users')
-            User.create_chat(sender_id, receiver_id)
+            try:
+                User.create_chat(sender_id, receiver_id)
+            except ChatAlreadyExistsError:
+                # the chat has been created by another worker or the cache of this one is stale
+                logger.info('Chat turned out to exist when Message __init__ was making it')
         if 'chat_id' not in kwargs:
             self.chat_id = User.get_chat_id_by_users_ids(sender_id, receiver_id)
         else:
@@ -2,7 +2,6 @@
 clearly to split application logic and understand it.
 """
 import sys
-import unittest
 
 from flask import Blueprint
 from flask import current_app
@@ -14,17 +13,16 @@ cli_commands = Blueprint('cli_commands', __name__, cli_group=None)
 
 @cli_commands.cli.command('tests')
 def tests_command():  # pragma: no cover
-    """Run all the tests from here"""
+    """Run all the tests from here. Some of them are pytest style functions, so pytest runs the unittest cases too"""
+    import pytest  # it is needed only for development
     logger.info('Tests are starting')
 
-    tests = unittest.TestLoader().discover('tests')
-    runner = unittest.TextTestRunner(verbosity=2)
-    result = runner.run(tests)
+    exit_code = pytest.main(['-v', 'tests'])
 
     # during the tests the logger became disabled, so, depending on the variable, we change its status
     logger.disabled = not current_app.config.get('LOGGING', False)
     logger.info('Tests have finished')
-    if result.wasSuccessful():
+    if exit_code == pytest.ExitCode.OK:
         logger.info('Tests were finished successfully')
         sys.exit(0)
     else:
@@ -2,6 +2,8 @@
 import logging.config
 import os
 
+from sqlalchemy.pool import StaticPool
+
 
 class Config:
     """
@@ -17,6 +19,8 @@ class Config:
     DB_PORT = os.getenv('DB_PORT') or '5432'
     DB_NAME = os.getenv('DB_NAME') or 'flask-simple-chats'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # if it is true, relationships, which are not loaded eagerly by a query, raise an error instead of lazy loading
+    SQLALCHEMY_RAISE_ON_LAZY_LOAD = False
     SQLALCHEMY_DATABASE_URI = f'postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
     MAIL_SERVER = os.getenv('MAIL_SERVER') or 'smtp.gmail.com'
     MAIL_PORT = os.getenv('MAIL_PORT') or '587'
@@ -29,6 +33,13 @@ class Config:
     CHATS_PER_PAGE = 8
     MESSAGES_PER_LOAD_EVENT = 10
     AUTHENTICATION_TOKEN_DEFAULT_EXPIRES_IN = 3600
+    # argon2 password hashing cost: number of iterations, memory usage in KiB and number of parallel threads.
+    # If the number of iterations is not set, it is chosen on the first app start, so that hashing takes the target
+    # time, and is saved in the instance folder for the next starts and the other workers
+    ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST') or 0) or None
+    PASSWORD_HASH_TARGET_MS = int(os.getenv('PASSWORD_HASH_TARGET_MS') or 250)
+    ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST') or 102400)
+    ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM') or 8)
     BUNDLE_ERRORS = True
 
     LOGGING = True
@@ -105,12 +116,18 @@ class Config:
 class TestConfig(Config):
     """
     Declares specific settings for testing.
-    Likely, you want to involve exactly sqlite database, so it will be created in a temporary path to prevent from
-    checking in.
+    Tests use in-memory sqlite database, so nothing is written to disk. Such a database lives as long as its connection,
+    so the engine keeps one connection shared between threads, and each application instance has its own database.
     """
     TESTING = True
     LOGGING = False
-    TEST_DB_PATH = os.getenv('TEST_DB_PATH') or '/tmp'
-    TEST_DB_NAME = os.getenv('TEST_DB_NAME') or 'chats_test_db.sqlite'
-    SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(TEST_DB_PATH, TEST_DB_NAME)}'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
     WTF_CSRF_ENABLED = False
+    # mails are only recorded by tests, never sent
+    MAIL_SUPPRESS_SEND = True
+    SQLALCHEMY_RAISE_ON_LAZY_LOAD = True
+    # the lowest costs argon2 accepts, tests do not need passwords to be hard to crack
+    ARGON2_TIME_COST = 1
+    ARGON2_MEMORY_COST = 8
+    ARGON2_PARALLELISM = 1
@@ -1,3 +1,58 @@
 """
 Module for putting unittests.
-"""
\ No newline at end of file
+"""
+import unittest
+from functools import lru_cache
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import db
+from app import make_app
+from app.authentication.models import get_password_hasher
+from app.config import TestConfig
+
+
+def emit_sqlite_begin(engine: Engine):
+    """pysqlite driver begins transactions only before data changes, so a savepoint, which is released, would commit
+    the outer transaction. Here transactions are begun explicitly, as sqlalchemy documentation recommends"""
+    @event.listens_for(engine, 'connect')
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def do_begin(connection):
+        connection.exec_driver_sql('BEGIN')
+
+
+@lru_cache(maxsize=None)
+def get_test_app(config: type = TestConfig) -> Flask:
+    """Return the application made with given config class. It is built only once in a process, so tests do not
+    register blueprints and extensions again and again. Application context must still be pushed by each test"""
+    app = make_app(config)
+    with app.app_context():
+        emit_sqlite_begin(db.engine)
+    return app
+
+
+@lru_cache(maxsize=None)
+def get_test_password_hash(password: str) -> str:
+    """Return the password hashed once in a process. Tests insert users with it directly instead of going through
+    the registration, which resolves e-mail domains over DNS and hashes the password again. Application context must
+    be pushed, a new one is not pushed here, because its teardown would remove the session of the running test"""
+    return get_password_hasher().hash(password)
+
+
+class AppTestCase(unittest.TestCase):
+    """Base of unittest style test cases, which gives them the application and the client of the test session. Each
+    test runs inside :func:`tests.conftest.db_session`"""
+    app: Flask
+    test_client: FlaskClient
+
+    @pytest.fixture(autouse=True)
+    def _use_app(self, app: Flask, db_session, client: FlaskClient):
+        self.app = app
+        self.test_client = client
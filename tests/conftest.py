@@ -0,0 +1,79 @@
+"""
+Fixtures for pytest style tests.
+The application is made once for a test session and the database schema is built once for it too. Each test, which
+uses :func:`db_session`, runs inside an outer transaction, which is rolled back after the test, so tests do not see each
+other's data. Commits and rollbacks made by the tested code only affect a savepoint, which is restarted after each of
+them.
+Function style test modules request :func:`db_session` by ``pytestmark = pytest.mark.usefixtures('db_session')``,
+unittest style test cases inherit :class:`tests.AppTestCase`.
+"""
+from typing import Iterator
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session
+
+from app import db
+from app.authentication.models import authentication_tokens_cache, chat_ids_cache
+from app.authentication.models import logged_in_users_cache, login_credentials_cache
+from tests import get_test_app
+
+# module level caches keep the rolled back data, so they are cleared together with the rollback
+CACHES = (chat_ids_cache, logged_in_users_cache, authentication_tokens_cache, login_credentials_cache)
+
+
+@pytest.fixture(scope='session')
+def app() -> Flask:
+    return get_test_app()
+
+
+@pytest.fixture(scope='session')
+def _schema(app: Flask) -> Iterator[None]:
+    with app.app_context():
+        db.create_all()
+    yield
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def db_session(app: Flask, _schema) -> Iterator[scoped_session]:
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        nested_transaction = connection.begin_nested()
+
+        def restart_savepoint(session, transaction):
+            nonlocal nested_transaction
+            if not nested_transaction.is_active:
+                nested_transaction = connection.begin_nested()
+
+        event.listen(db.session, 'after_transaction_end', restart_savepoint)
+        # flask_sqlalchemy binds each table to the engine by default, which would take precedence over the connection
+        db.session.remove()
+        session_options = db.session.session_factory.kw.copy()
+        db.session.configure(bind=connection, binds={})
+
+        yield db.session
+
+        db.session.remove()
+        db.session.session_factory.kw = session_options
+        event.remove(db.session, 'after_transaction_end', restart_savepoint)
+        transaction.rollback()
+        connection.close()
+        for cache in CACHES:
+            cache.clear()
+
+
+@pytest.fixture(scope='session')
+def _test_client(app: Flask) -> FlaskClient:
+    return app.test_client()
+
+
+@pytest.fixture
+def client(_test_client: FlaskClient) -> FlaskClient:
+    """The client is shared by the session, so a session cookie of the previous test must not log the next one in"""
+    _test_client.cookie_jar.clear()
+    return _test_client
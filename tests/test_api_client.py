@@ -1,50 +1,57 @@
 import base64
 import re
-import time
-import unittest
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List
 
+import pytest
 from flask import current_app
+from freezegun import freeze_time
+from sqlalchemy import event
 
 from app import db
 from app import mail
-from app import make_app
 from app.authentication.models import User, chats
+from app.authentication.models import authentication_tokens_cache, logged_in_users_cache
 from app.chats.models import Message
-from app.config import TestConfig
+from tests import AppTestCase, get_test_password_hash
 
 
-class ApiClientTestCase(unittest.TestCase):
+class ApiClientTestCase(AppTestCase):
     """Tries out rest api functionality"""
 
-    def register_users(self, number: int):
-        for i in range(1, number + 1):
-            self.test_client.post('/api/register', json={'email': f'user{i}@gmail.com', 'username': f'username{i}',
-                                                         'name': f'name{i}', 'password': '12345678'})
+    @staticmethod
+    def register_users(number: int):
+        db.session.add_all(User(email=f'user{i}@gmail.com', username=f'username{i}', name=f'name{i}',
+                                password_hash=get_test_password_hash('12345678')) for i in range(1, number + 1))
+        db.session.commit()
 
     def init_main_user(self, name='main'):
-        self.test_client.post('/api/register', json={'email': f'{name}@gmail.com', 'username': f'{name}_username',
-                                                     'name': f'{name}_name', 'password': '12345678'})
+        db.session.add(User(email=f'{name}@gmail.com', username=f'{name}_username', name=f'{name}_name',
+                            password_hash=get_test_password_hash('12345678')))
+        db.session.commit()
         self.basic_auth_header = {
             'Authorization': f'Basic {base64.b64encode(f"{name}@gmail.com:12345678".encode()).decode()}'}
         token = self.test_client.get('/api/token', headers=self.basic_auth_header).json['token']
         self.bearer_auth_header = {'Authorization': f'Bearer {token}'}
 
-    def setUp(self) -> None:
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
-        self.app = make_app(TestConfig)
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        self.test_client = self.app.test_client()
-        db.create_all()
-
-    def tearDown(self) -> None:
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
+    @staticmethod
+    @contextmanager
+    def record_users_selects() -> Iterator[List[str]]:
+        """Collects all the SELECT statements from users table which are executed inside the context"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().startswith('SELECT') and 'FROM users' in statement:
+                statements.append(statement)
 
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    @pytest.mark.slow
     def test_register(self):
         self.assertEqual(len(User.query.all()), 0)
         response = self.test_client.post('/api/register', json={'email': 'test@gmail.com', 'username': 'test_username',
@@ -98,10 +105,11 @@ class ApiClientTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 401)
         self.assertEqual(response.json['message'], 'Wrong password! Try again')
 
-        token = user.get_authentication_token(0.5)
-        time.sleep(1)
-        bearer_expired_token = {'Authorization': f'Bearer {token}'}
-        response = self.test_client.get('/api/token', headers=bearer_expired_token)
+        with freeze_time() as frozen_time:
+            token = user.get_authentication_token(0.5)
+            frozen_time.tick(1)
+            bearer_expired_token = {'Authorization': f'Bearer {token}'}
+            response = self.test_client.get('/api/token', headers=bearer_expired_token)
         self.assertEqual(response.status_code, 401)
         self.assertEqual(response.json['message'], 'Your authentication token period has expired')
 
@@ -117,8 +125,9 @@ class ApiClientTestCase(unittest.TestCase):
                          'To access use Basic (base64) or Bearer (jwt) http authorization')
 
     def test_token(self):
-        self.test_client.post('/api/register', json={'email': 'test@gmail.com', 'username': 'test_username',
-                                                     'name': 'test_name', 'password': '12345678'})
+        db.session.add(User(email='test@gmail.com', username='test_username', name='test_name',
+                            password_hash=get_test_password_hash('12345678')))
+        db.session.commit()
         response = self.test_client.get('/api/token', headers={
             'Authorization': f'Basic {base64.b64encode(b"test@gmail.com:12345678").decode()}'})
         self.assertEqual(response.status_code, 200)
@@ -153,9 +162,10 @@ class ApiClientTestCase(unittest.TestCase):
     def test_forgot_password_expired_and_bad_token(self):
         self.init_main_user()
         user = User.get_user_by_id(1)
-        token = user.get_reset_password_token(0.5)
-        time.sleep(1)
-        response = self.test_client.post('/api/reset-password', json={'token': token, 'password': '87654321'})
+        with freeze_time() as frozen_time:
+            token = user.get_reset_password_token(0.5)
+            frozen_time.tick(1)
+            response = self.test_client.post('/api/reset-password', json={'token': token, 'password': '87654321'})
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.json['message'], 'Reset password token has expired. Use a new one')
 
@@ -239,6 +249,8 @@ class ApiClientTestCase(unittest.TestCase):
         self.assertEqual(user['user_id'], 1)
         self.assertEqual(user['username'], 'username1')
         self.assertEqual(user['name'], 'name1')
+        # the same naive iso8601 format as datetime_writing of messages
+        self.assertEqual(datetime.fromisoformat(user['date_joined']), User.query.get(1).date_joined)
 
         response = self.test_client.get('/api/users/2', headers=self.basic_auth_header)
         self.assertEqual(response.status_code, 200)
@@ -250,6 +262,20 @@ class ApiClientTestCase(unittest.TestCase):
         response = self.test_client.get('/api/users/4', headers=self.basic_auth_header)
         self.assertEqual(response.status_code, 404)
 
+    def test_user_single_users_selects(self):
+        self.init_main_user()
+        self.register_users(1)
+        for headers in (self.basic_auth_header, self.bearer_auth_header):
+            for user_id, expected_selects in ((1, 1), (2, 2)):
+                db.session.expunge_all()
+                logged_in_users_cache.clear()
+                authentication_tokens_cache.clear()
+                with self.record_users_selects() as statements:
+                    response = self.test_client.get(f'/api/users/{user_id}', headers=headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json['data']['user_id'], user_id)
+                self.assertEqual(len(statements), expected_selects)
+
     def test_chats_list(self):
         self.init_main_user()
         self.register_users(3)
@@ -379,6 +405,7 @@ class ApiClientTestCase(unittest.TestCase):
         self.assertTrue(data['user_id'] == 1 and data['chat_id'] == 1)
         message = data['data']
         self.assertTrue(message['text'] == 'bla2' and message['sender_id'] == 2 and message['receiver_id'] == 1)
+        self.assertEqual(datetime.fromisoformat(message['datetime_writing']), m2.datetime_writing)
 
         response = self.test_client.get('/api/chats/1/messages/1', headers=self.bearer_auth_header)
         self.assertEqual(response.status_code, 200)
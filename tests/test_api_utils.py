@@ -1,39 +1,21 @@
-import unittest
 from typing import List
 
 from werkzeug.exceptions import NotFound, Forbidden
 
 from app import db
-from app import make_app
 from app.api.utils import abort_if_not_own, abort_if_not_a_participant, abort_if_not_from_a_chat
 from app.api.utils import longer_than_zero
 from app.api.utils import model_filter_by_get_params as mod_fil
 from app.api.utils import return_chat_or_abort, return_user_or_abort, return_message_or_abort
 from app.authentication.models import User
 from app.chats.models import Message
-from app.config import TestConfig
+from tests import AppTestCase
 from tests.test_user_model import init_users
 
 
-class ApiUtilsTestCase(unittest.TestCase):
+class ApiUtilsTestCase(AppTestCase):
     """Tests utils from api blueprint"""
 
-    def setUp(self) -> None:
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
-        self.app = make_app(TestConfig)
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        self.test_client = self.app.test_client()
-        db.create_all()
-
-    def tearDown(self) -> None:
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
-
     def test_return_chat_or_abort(self):
         users = init_users(2)
         User.create_chat(1, 2)
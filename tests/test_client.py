@@ -1,327 +1,316 @@
 import re
-import time
-import unittest
+from typing import Callable
 
+import pytest
 from flask import get_flashed_messages
 from flask import session
-from sqlalchemy.sql import exists
+from freezegun import freeze_time
+from sqlalchemy import event
+from sqlalchemy.sql import select
 
 from app import db
 from app import mail
-from app import make_app
-from app.authentication.models import User
+from app.authentication.models import User, get_password_hasher, logged_in_users_cache, login_credentials_cache
 from app.chats.models import Message
 from app.chats.utils import get_users_unique_room_name
-from app.config import TestConfig
 
+TOKEN_RE = re.compile(r'https?://.+/(.+)')
+PASSWORD = 'Who am I'
+USER1 = {'email': 'test@gmail.com', 'username': 'test_user', 'name': 'Ann', 'password1': PASSWORD,
+         'password2': PASSWORD}
+USER2 = {'email': 'test2@gmail.com', 'username': 'test_user2', 'name': 'Ann', 'password1': PASSWORD,
+         'password2': PASSWORD}
 
-class ClientTestCase(unittest.TestCase):
-    """Resembles standard interaction with a client"""
+pytestmark = pytest.mark.usefixtures('db_session')
 
-    def setUp(self) -> None:
-        self.app = make_app(TestConfig)
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        self.test_client = self.app.test_client()
-        db.create_all()
 
-    def tearDown(self) -> None:
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
+@pytest.fixture(scope='module')
+def password_hash(app) -> str:
+    """:data:`PASSWORD` hashed once for the whole module"""
+    with app.app_context():
+        return get_password_hasher().hash(PASSWORD)
 
-    def test_register(self):
-        response = self.test_client.post('/authentication/register',
-                                         data={'email': 'test@gmail.com', 'username': 'test_user',
-                                               'name': 'Ann', 'password1': 'Who am I', 'password2': 'Who am I'},
-                                         follow_redirects=True)
 
-        self.assertEqual(response.status_code, 200)
-        self.assertTrue(db.session.query(exists().where(User.email == 'test@gmail.com')))
-        user = User.query.filter_by(email='test@gmail.com').first()
-        self.assertEqual(user.username, 'test_user')
-        self.assertEqual(user.name, 'Ann')
-        self.assertTrue(user.verify_password('Who am I'))
-
-        response_invalid_data = self.test_client.post('/authentication/register',
-                                                      data={'email': 'test2@gmail.com', 'username': 'test_user2',
-                                                            'name': 'Ann', 'password1': 'Who I',
-                                                            'password2': 'Who am I'},
-                                                      follow_redirects=True)
-        self.assertTrue("Given passwords do not match" in response_invalid_data.data.decode())  # flashed message
-        self.assertTrue('<title>Register</title>' in response_invalid_data.data.decode())
-
-        response_existing_email = self.test_client.post('/authentication/register',
-                                                        data={'email': 'test@gmail.com', 'username': 'test_user2',
-                                                              'name': 'Ann', 'password1': 'Who am I',
-                                                              'password2': 'Who am I'},
-                                                        follow_redirects=True)
-        self.assertEqual(response_existing_email.status_code, 200)
-        self.assertTrue('<title>Register</title>' in response_existing_email.data.decode())
-
-        response_existing_username = self.test_client.post('/authentication/register',
-                                                           data={'email': 'test2@gmail.com', 'username': 'test_user',
-                                                                 'name': 'Ann', 'password1': 'Who am I',
-                                                                 'password2': 'Who am I'},
-                                                           follow_redirects=True)
-        self.assertEqual(response_existing_username.status_code, 200)
-        self.assertTrue("<title>Register</title>" in response_existing_username.data.decode())
-
-    def test_login_logout(self):
-        with self.test_client as client:
-            client.post('/authentication/register',
-                        data={'email': 'test@gmail.com', 'username': 'test_user',
-                              'name': 'Ann', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-            self.assertFalse('current_user_id' in session)
-
-            response_login = client.post('/authentication/login', data={'email': 'test@gmail.com',
-                                                                        'password': 'Who am I'},
-                                         follow_redirects=True)
-            self.assertEqual(response_login.status_code, 200)
-            self.assertTrue('<title>Simple chats</title>' in response_login.data.decode())
-            self.assertTrue('current_user_id' in session)
-
-            response_logout = client.get('/authentication/logout', follow_redirects=True)
-            self.assertEqual(response_logout.status_code, 200)
-            self.assertFalse('current_user_id' in session)
-
-            response_wrong_email = client.post('/authentication/login', data={'email': 'wrong@gmail.com',
-                                                                              'password': 'p'}, follow_redirects=True)
-            self.assertEqual(response_wrong_email.status_code, 200)
-            self.assertTrue('Wrong email! Maybe, you have not registered' in response_wrong_email.data.decode())
-            self.assertTrue('<title>Login</title>' in response_wrong_email.data.decode())
-
-            response_wrong_password = client.post('/authentication/login', data={'email': 'test@gmail.com',
-                                                                                 'password': 'p'},
-                                                  follow_redirects=True)
-            self.assertEqual(response_wrong_password.status_code, 200)
-            self.assertTrue('Wrong password! Try again' in response_wrong_password.data.decode())
-
-    def test_forgot_reset_password(self):
-        self.test_client.post('/authentication/register',
-                              data={'email': 'test@gmail.com', 'username': 'test_user',
-                                    'name': 'Ann', 'password1': 'I will be forgotten',
-                                    'password2': 'I will be forgotten'},
-                              follow_redirects=True)
-        user = User.query.filter_by(email='test@gmail.com').first()
-        self.assertTrue(user.verify_password('I will be forgotten'))
-
-        with mail.record_messages() as records:
-            self.test_client.post('/authentication/forgot_password', data={'email': 'test@gmail.com'},
-                                  follow_redirects=True)
-            self.assertEqual(len(records), 1)
-            token_pattern = 'https?://.+/(.+)'
-            match = re.search(token_pattern, records[0].body)
-            token = match[1]
-
-        response_reset_get = self.test_client.get(f'/authentication/reset_password/{token}')
-        self.assertTrue('<title>Reset</title>' in response_reset_get.data.decode())
-
-        response = self.test_client.post(f'/authentication/reset_password/{token}',
-                                         data={'password1': 'New password', 'password2': 'Not a new password'})
-        self.assertEqual(response.status_code, 200)
-        self.assertTrue("Given passwords do not match" in response.data.decode())  # flashed message
-        self.assertTrue('<title>Reset</title>' in response.data.decode())
-
-        self.test_client.post(f'/authentication/reset_password/{token}',
-                              data={'password1': 'New password', 'password2': 'New password'})
-        self.assertTrue(user.verify_password('New password'))
-
-        response_invalid_email = self.test_client.post('/authentication/forgot_password',
-                                                       data={'email': 'test_invalidgmail.com'},
-                                                       follow_redirects=True)
-        self.assertEqual(response_invalid_email.status_code, 200)
-        self.assertTrue("<title>Forgot</title>" in response_invalid_email.data.decode())
-
-        response_not_existing_email = self.test_client.post('/authentication/forgot_password',
-                                                            data={'email': 'test_invalid@gmail.com'},
-                                                            follow_redirects=True)
-        self.assertEqual(response_not_existing_email.status_code, 200)
-        self.assertTrue("User with such an e-mail does not exist" in response_not_existing_email.data.decode())
-
-    def test_login_required(self):
-        with self.test_client as client:
-            response = client.get('/chats/search')
-            self.assertEqual(response.status_code, 302)
-            self.assertEqual(get_flashed_messages(), ['You have to log in first', ])
-
-    def test_anonymous_required(self):
-        with self.test_client as client:
-            client.post('/authentication/register',
-                        data={'email': 'test@gmail.com', 'username': 'test_user',
-                              'name': 'Ann', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-
-            client.post('/authentication/login', data={'email': 'test@gmail.com', 'password': 'Who am I'},
-                        follow_redirects=True)
-
-            response = client.get('/authentication/register')
-            self.assertEqual(response.status_code, 302)
-            self.assertEqual(get_flashed_messages(), ['You have been already logged in', ])
-
-    def test_register_get(self):
-        response = self.test_client.get('/authentication/register')
-        self.assertEqual(response.status_code, 200)
-        self.assertTrue('<title>Register</title>' in response.data.decode())
-
-    def test_login_get(self):
-        response = self.test_client.get('/authentication/login')
-        self.assertEqual(response.status_code, 200)
-        self.assertTrue('<title>Login</title>' in response.data.decode())
-
-    def test_forgot_password_get(self):
-        response = self.test_client.get('/authentication/forgot_password')
-        self.assertEqual(response.status_code, 200)
-        self.assertTrue('<title>Forgot</title>' in response.data.decode())
-
-    def test_reset_password_expired_get(self):
-        user = User(email='test@gmail.com', username='test', password_hash='123')
-        db.session.add(user)
+@pytest.fixture
+def add_users(password_hash) -> Callable[..., None]:
+    """Returns function which inserts users with :data:`PASSWORD`. Only the registration test needs to go through the
+    registration view, so others do not pay for hashing the same password again"""
+    def add(*suffixes: str):
+        db.session.add_all(User(email=f'test{suffix}@gmail.com', username=f'test_user{suffix}', name=f'Ann{suffix}',
+                                password_hash=password_hash) for suffix in suffixes)
         db.session.commit()
+    return add
+
+
+@pytest.mark.slow
+def test_register(client):
+    response = client.post('/authentication/register', data=USER1, follow_redirects=True)
+
+    assert response.status_code == 200
+    user = db.session.scalar(select(User).filter_by(email=USER1['email']))
+    assert user is not None
+    assert user.username == 'test_user'
+    assert user.name == 'Ann'
+    assert user.verify_password(PASSWORD)
+
+    response_invalid_data = client.post('/authentication/register',
+                                        data={**USER2, 'password1': 'Who I'}, follow_redirects=True)
+    assert b"Given passwords do not match" in response_invalid_data.data  # flashed message
+    assert b'<title>Register</title>' in response_invalid_data.data
+
+    response_existing_email = client.post('/authentication/register',
+                                          data={**USER2, 'email': USER1['email']},
+                                          follow_redirects=True)
+    assert response_existing_email.status_code == 200
+    assert b'<title>Register</title>' in response_existing_email.data
+
+    response_existing_username = client.post('/authentication/register',
+                                             data={**USER2, 'username': USER1['username']},
+                                             follow_redirects=True)
+    assert response_existing_username.status_code == 200
+    assert b"<title>Register</title>" in response_existing_username.data
+
+
+def test_login_logout(client, add_users):
+    with client:
+        add_users('')
+        # a request is needed to have the session of the client in the context
+        client.get('/authentication/login')
+        assert 'current_user_id' not in session
+
+        response_login = client.post('/authentication/login', data={'email': 'test@gmail.com',
+                                                                    'password': PASSWORD},
+                                     follow_redirects=True)
+        assert response_login.status_code == 200
+        assert b'<title>Simple chats</title>' in response_login.data
+        assert 'current_user_id' in session
+        assert 1 in logged_in_users_cache
+        assert login_credentials_cache['test@gmail.com'][0] == 1
+
+        response_logout = client.get('/authentication/logout', follow_redirects=True)
+        assert response_logout.status_code == 200
+        assert 'current_user_id' not in session
+        assert 1 not in logged_in_users_cache
+
+        response_wrong_email = client.post('/authentication/login', data={'email': 'wrong@gmail.com',
+                                                                          'password': 'p'}, follow_redirects=True)
+        assert response_wrong_email.status_code == 200
+        assert b'Wrong email! Maybe, you have not registered' in response_wrong_email.data
+        assert b'<title>Login</title>' in response_wrong_email.data
+
+        response_wrong_password = client.post('/authentication/login', data={'email': 'test@gmail.com',
+                                                                             'password': 'p'},
+                                              follow_redirects=True)
+        assert response_wrong_password.status_code == 200
+        assert b'Wrong password! Try again' in response_wrong_password.data
+
+
+@pytest.mark.slow
+def test_forgot_reset_password(client):
+    client.post('/authentication/register',
+                data={**USER1, 'password1': 'I will be forgotten', 'password2': 'I will be forgotten'},
+                follow_redirects=True)
+    user = User.query.filter_by(email='test@gmail.com').first()
+    assert user.verify_password('I will be forgotten')
+
+    with mail.record_messages() as records:
+        client.post('/authentication/forgot_password', data={'email': 'test@gmail.com'},
+                    follow_redirects=True)
+        assert len(records) == 1
+        match = TOKEN_RE.search(records[0].body)
+        token = match[1]
+
+    response_reset_get = client.get(f'/authentication/reset_password/{token}')
+    assert b'<title>Reset</title>' in response_reset_get.data
+
+    response = client.post(f'/authentication/reset_password/{token}',
+                           data={'password1': 'New password', 'password2': 'Not a new password'})
+    assert response.status_code == 200
+    assert b"Given passwords do not match" in response.data  # flashed message
+    assert b'<title>Reset</title>' in response.data
+
+    client.post(f'/authentication/reset_password/{token}',
+                data={'password1': 'New password', 'password2': 'New password'})
+    assert user.verify_password('New password')
+
+    response_invalid_email = client.post('/authentication/forgot_password',
+                                         data={'email': 'test_invalidgmail.com'},
+                                         follow_redirects=True)
+    assert response_invalid_email.status_code == 200
+    assert b"<title>Forgot</title>" in response_invalid_email.data
+
+    response_not_existing_email = client.post('/authentication/forgot_password',
+                                              data={'email': 'test_invalid@gmail.com'},
+                                              follow_redirects=True)
+    assert response_not_existing_email.status_code == 200
+    assert b"User with such an e-mail does not exist" in response_not_existing_email.data
+
+
+def test_login_required(client):
+    with client:
+        response = client.get('/chats/search')
+        assert response.status_code == 302
+        assert get_flashed_messages() == ['You have to log in first', ]
+
+
+def test_anonymous_required(client, add_users):
+    with client:
+        add_users('')
+
+        client.post('/authentication/login', data={'email': 'test@gmail.com', 'password': PASSWORD},
+                    follow_redirects=True)
+
+        response = client.get('/authentication/register')
+        assert response.status_code == 302
+        assert get_flashed_messages() == ['You have been already logged in', ]
+
+
+def test_register_get(client):
+    response = client.get('/authentication/register')
+    assert response.status_code == 200
+    assert b'<title>Register</title>' in response.data
+
+
+def test_login_get(client):
+    response = client.get('/authentication/login')
+    assert response.status_code == 200
+    assert b'<title>Login</title>' in response.data
+
+
+def test_forgot_password_get(client):
+    response = client.get('/authentication/forgot_password')
+    assert response.status_code == 200
+    assert b'<title>Forgot</title>' in response.data
+
+
+def test_reset_password_expired_get(client):
+    user = User(email='test@gmail.com', username='test', password_hash='123')
+    db.session.add(user)
+    db.session.commit()
+    with freeze_time() as frozen_time:
         token = user.get_reset_password_token(0.5)
-        time.sleep(1)
-        response = self.test_client.get(f'/authentication/reset_password/{token}')
-        self.assertEqual(response.status_code, 200)
-        self.assertTrue('<title>Expired</title>' in response.data.decode())
-
-    def test_reset_password_invalid_token_get(self):
-        """This view required only valid token, so, the response is 404"""
-        response = self.test_client.get('/authentication/reset_password/invalid_token')
-        self.assertEqual(response.status_code, 404)
-        self.assertTrue('<title>Page not found</title>' in response.data.decode())
-
-    def test_user_chats_list(self):
-        with self.test_client as client:
-            client.post('/authentication/register',
-                        data={'email': 'test1@gmail.com', 'username': 'test_user1',
-                              'name': 'Ann1', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-            client.post('/authentication/register',
-                        data={'email': 'test2@gmail.com', 'username': 'test_user2',
-                              'name': 'Ann2', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-
-            client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': 'Who am I'},
-                        follow_redirects=True)
-
-            User.create_chat(1, 2)
-            db.session.add(Message(text='test_text', sender_id=1, receiver_id=2))
-            db.session.commit()
-            response = client.get('/chats/list')
-            self.assertEqual(response.status_code, 200)
-            response_data = response.data.decode()
-            self.assertTrue('<title>Chats list</title>' in response_data)
-            self.assertTrue('test_text' in response_data)
-            self.assertTrue('Ann2' in response_data)
-            self.assertTrue('test_user2' in response_data)
-
-    def test_user_chat_begin_end(self):
-        with self.test_client as client:
-            client.post('/authentication/register',
-                        data={'email': 'test1@gmail.com', 'username': 'test_user1',
-                              'name': 'Ann1', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-            client.post('/authentication/register',
-                        data={'email': 'test2@gmail.com', 'username': 'test_user2',
-                              'name': 'Ann2', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-
-            client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': 'Who am I'},
-                        follow_redirects=True)
-            self.assertEqual(session['current_user_id'], 1)
-            response = client.get('/chats/begin/test_user2')
-            self.assertEqual(response.status_code, 302)
-            self.assertEqual(session['room_name'], get_users_unique_room_name('test_user1', 'test_user2'))
-            self.assertEqual(session['user_name'], 'Ann1')
-            self.assertEqual(session['companion_id'], 2)
-
-            response = client.get('/chats/end')
-            self.assertEqual(response.status_code, 302)
-            self.assertEqual(session['current_user_id'], 1)
-
-    def test_user_chat_begin_404(self):
-        with self.test_client as client:
-            client.post('/authentication/register',
-                        data={'email': 'test1@gmail.com', 'username': 'test_user1',
-                              'name': 'Ann1', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-
-            client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': 'Who am I'},
-                        follow_redirects=True)
-
-            self.assertEqual(client.get('/chats/begin/test_user1').status_code, 404)
-            self.assertEqual(client.get('/chats/begin/I_do_not_exist').status_code, 404)
-
-    def test_user_chat_going(self):
-        with self.test_client as client:
-            client.post('/authentication/register',
-                        data={'email': 'test1@gmail.com', 'username': 'test_user1',
-                              'name': 'Ann1', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-            client.post('/authentication/register',
-                        data={'email': 'test2@gmail.com', 'username': 'test_user2',
-                              'name': 'Ann2', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-
-            client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': 'Who am I'},
-                        follow_redirects=True)
-            response = client.get('/chats/begin/test_user2')
-            self.assertEqual(response.status_code, 302)
-            response = client.get('/chats/going')
-            self.assertEqual(response.status_code, 200)
-
-    def test_user_chat_going_404(self):
-        with self.test_client as client:
-            client.post('/authentication/register',
-                        data={'email': 'test1@gmail.com', 'username': 'test_user1',
-                              'name': 'Ann1', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-            client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': 'Who am I'},
-                        follow_redirects=True)
-            response = client.get('/chats/going')
-            self.assertEqual(response.status_code, 404)
-
-    def test_user_search_for_chat_get(self):
-        with self.test_client as client:
-            client.post('/authentication/register',
-                        data={'email': 'test1@gmail.com', 'username': 'test_user1',
-                              'name': 'Ann1', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-            client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': 'Who am I'},
-                        follow_redirects=True)
+        frozen_time.tick(1)
+        response = client.get(f'/authentication/reset_password/{token}')
+    assert response.status_code == 200
+    assert b'<title>Expired</title>' in response.data
+
+
+def test_reset_password_invalid_token_get(client):
+    """This view required only valid token, so, the response is 404"""
+    response = client.get('/authentication/reset_password/invalid_token')
+    assert response.status_code == 404
+    assert b'<title>Page not found</title>' in response.data
+
+
+def test_user_chats_list(client, add_users):
+    with client:
+        add_users('1', '2')
+
+        client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': PASSWORD},
+                    follow_redirects=True)
+
+        User.create_chat(1, 2)
+        db.session.add(Message(text='test_text', sender_id=1, receiver_id=2))
+        db.session.commit()
+        response = client.get('/chats/list')
+        assert response.status_code == 200
+        assert b'<title>Chats list</title>' in response.data
+        assert b'test_text' in response.data
+        assert b'Ann2' in response.data
+        assert b'test_user2' in response.data
+
+
+def test_user_chat_begin_end(client, add_users):
+    with client:
+        add_users('1', '2')
+
+        client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': PASSWORD},
+                    follow_redirects=True)
+        assert session['current_user_id'] == 1
+        response = client.get('/chats/begin/test_user2')
+        assert response.status_code == 302
+        assert session['room_name'] == get_users_unique_room_name('test_user1', 'test_user2')
+        assert session['user_name'] == 'Ann1'
+        assert session['companion_id'] == 2
+
+        response = client.get('/chats/end')
+        assert response.status_code == 302
+        assert session['current_user_id'] == 1
+
+
+def test_user_chat_begin_404(client, add_users):
+    with client:
+        add_users('1')
+
+        client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': PASSWORD},
+                    follow_redirects=True)
+
+        assert client.get('/chats/begin/test_user1').status_code == 404
+        assert client.get('/chats/begin/I_do_not_exist').status_code == 404
+
+
+def test_user_chat_going(client, add_users):
+    with client:
+        add_users('1', '2')
+
+        client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': PASSWORD},
+                    follow_redirects=True)
+        response = client.get('/chats/begin/test_user2')
+        assert response.status_code == 302
+        response = client.get('/chats/going')
+        assert response.status_code == 200
+
+
+def test_user_chat_going_404(client, add_users):
+    with client:
+        add_users('1')
+        client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': PASSWORD},
+                    follow_redirects=True)
+        response = client.get('/chats/going')
+        assert response.status_code == 404
+
+
+def test_user_search_for_chat_get(client, add_users):
+    with client:
+        add_users('1')
+        client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': PASSWORD},
+                    follow_redirects=True)
+        logged_in_users_cache.clear()
+        db.session.expunge_all()
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(db.session.connection(), 'before_cursor_execute', listener)
+        try:
             response = client.get('/chats/search')
-            self.assertEqual(response.status_code, 200)
-            self.assertTrue('<title>Search for</title>' in response.data.decode())
-
-    def test_ajax_search(self):
-        with self.test_client as client:
-            client.post('/authentication/register',
-                        data={'email': 'test1@gmail.com', 'username': 'test_user1',
-                              'name': 'Ann1', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-            client.post('/authentication/register',
-                        data={'email': 'test2@gmail.com', 'username': 'test_user2',
-                              'name': 'Ann2', 'password1': 'Who am I', 'password2': 'Who am I'},
-                        follow_redirects=True)
-
-            client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': 'Who am I'},
-                        follow_redirects=True)
-
-            response = client.get('/chats/ajax-search')
-            self.assertEqual(response.status_code, 404)
-            response = client.get('/chats/ajax-search?search-string=test')
-            self.assertEqual(response.status_code, 404)
-
-            headers = {
-                'X-Requested-With': 'XMLHttpRequest',
-            }
-            response = client.get('/chats/ajax-search?search-string=test', headers=headers)
-            self.assertEqual(response.status_code, 200)
-            json = response.json
-            self.assertEqual(json['data'], [{'name': 'Ann2', 'username': 'test_user2'}])
-
-            response = client.get('/chats/ajax-search?search-string=strange_string', headers=headers)
-            self.assertEqual(response.status_code, 200)
-            json = response.json
-            self.assertEqual(json['data'], [])
+        finally:
+            event.remove(db.session.connection(), 'before_cursor_execute', listener)
+        assert response.status_code == 200
+        assert b'<title>Search for</title>' in response.data
+        # the logged in user is recognized by one query without loading his chat partners
+        assert len(statements) == 1
+
+
+def test_ajax_search(client, add_users):
+    with client:
+        add_users('1', '2')
+
+        client.post('/authentication/login', data={'email': 'test1@gmail.com', 'password': PASSWORD},
+                    follow_redirects=True)
+
+        response = client.get('/chats/ajax-search')
+        assert response.status_code == 404
+        response = client.get('/chats/ajax-search?search-string=test')
+        assert response.status_code == 404
+
+        headers = {
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+        response = client.get('/chats/ajax-search?search-string=test', headers=headers)
+        assert response.status_code == 200
+        json = response.json
+        assert json['data'] == [{'name': 'Ann2', 'username': 'test_user2'}]
+
+        response = client.get('/chats/ajax-search?search-string=strange_string', headers=headers)
+        assert response.status_code == 200
+        json = response.json
+        assert json['data'] == []
@@ -1,10 +1,14 @@
 import logging
 import os
+import tempfile
 import unittest
 
+import pytest
 from flask import current_app
 
+from app import db
 from app import make_app
+from app.authentication.models import argon2_time_cost_path, load_argon2_time_cost, probe_argon2_time_cost
 from app.config import TestConfig, Config
 
 
@@ -30,16 +34,35 @@ class InitTestCase(unittest.TestCase):
     def test_instance_folder_exists(self):
         self.assertTrue(os.path.exists(self.app.instance_path))
 
+    @pytest.mark.slow
     def test_instance_config(self):
-        with open(os.path.join(self.app.instance_path, 'production_config.py'), 'w') as file:
-            file.write("TEST_VAR = 666\nSECRET_KEY = 'blablabla'")
-        temp_app = make_app()
-        self.assertEqual(temp_app.config['TEST_VAR'], 666)
-        self.assertEqual(temp_app.config['SECRET_KEY'], 'blablabla')
-        os.remove(os.path.join(self.app.instance_path, 'production_config.py'))
-
-    def test_testing_db_exists(self):
-        self.assertTrue(os.path.exists(os.path.join(self.app.config['TEST_DB_PATH'], self.app.config['TEST_DB_NAME'])))
+        # a temporary instance folder, so the files of the real one, e.g. saved argon2 time cost, are left untouched
+        with tempfile.TemporaryDirectory() as instance_path:
+            with open(os.path.join(instance_path, 'production_config.py'), 'w') as file:
+                file.write("TEST_VAR = 666\nSECRET_KEY = 'blablabla'")
+            temp_app = make_app(instance_path=instance_path)
+            self.assertEqual(temp_app.instance_path, instance_path)
+            self.assertEqual(temp_app.config['TEST_VAR'], 666)
+            self.assertEqual(temp_app.config['SECRET_KEY'], 'blablabla')
+
+    def test_argon2_time_cost_probe(self):
+        self.assertEqual(self.app.config['ARGON2_TIME_COST'], TestConfig.ARGON2_TIME_COST)
+        self.assertEqual(probe_argon2_time_cost(TestConfig.ARGON2_MEMORY_COST, TestConfig.ARGON2_PARALLELISM, 0), 1)
+        parameters = TestConfig.ARGON2_MEMORY_COST, TestConfig.ARGON2_PARALLELISM, TestConfig.PASSWORD_HASH_TARGET_MS
+        with tempfile.TemporaryDirectory() as instance_path:
+            temp_app = make_app(type('ProbingConfig', (TestConfig,), {'ARGON2_TIME_COST': None}), instance_path)
+            self.assertGreaterEqual(temp_app.config['ARGON2_TIME_COST'], 1)
+            path = argon2_time_cost_path(instance_path, *parameters)
+            with open(path) as file:
+                self.assertEqual(int(file.read()), temp_app.config['ARGON2_TIME_COST'])
+            # the saved cost is taken instead of probing it again
+            with open(path, 'w') as file:
+                file.write('42')
+            self.assertEqual(load_argon2_time_cost(instance_path, *parameters), 42)
+
+    def test_testing_db_in_memory(self):
+        self.assertEqual(self.app.config['SQLALCHEMY_DATABASE_URI'], 'sqlite://')
+        self.assertEqual(db.engine.url.database, None)
 
     def test_loggers_disable_status(self):
         flag = self.app.config['LOGGING']
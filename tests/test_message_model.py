@@ -1,36 +1,18 @@
-import unittest
 from datetime import datetime
 
-from sqlalchemy import select
+from sqlalchemy import func, select
 
 from app import db
-from app import make_app
-from app.authentication import User
-from app.authentication.models import chats
+from app.authentication.models import chats, chat_ids_cache
 from app.chats import Message
 from app.chats.exceptions import MessageNotFoundByIndexError
-from app.config import TestConfig
+from tests import AppTestCase
 from tests.test_user_model import init_users
 
 
-class MessageModelTestCase(unittest.TestCase):
+class MessageModelTestCase(AppTestCase):
     """Tests Message class methods"""
 
-    def setUp(self) -> None:
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
-        self.app = make_app(TestConfig)
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        db.create_all()
-
-    def tearDown(self) -> None:
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
-
     def test_message_init(self):
         db.session.add_all(init_users(2))
         db.session.commit()
@@ -38,12 +20,20 @@ class MessageModelTestCase(unittest.TestCase):
         self.assertEqual(message.chat_id, 1)
         db.session.add(message)
         db.session.commit()
-        result = db.session.execute(select(chats))
-        self.assertEqual(len(result.all()), 1)
-        result.close()
+        self.assertEqual(db.session.execute(select(func.count()).select_from(chats)).scalar(), 1)
         with self.assertRaises(AssertionError):
             Message(text='blabla', datetime_writing=datetime.now(), sender_id=1, receiver_id=2, chat_id=3)
 
+    def test_message_init_stale_chat_cache(self):
+        db.session.add_all(init_users(2))
+        db.session.commit()
+        # this worker has cached that there is no chat, while another one has created it
+        chat_ids_cache[(1, 2)] = None
+        db.session.execute(chats.insert().values(user1_id=1, user2_id=2))
+        message = Message(text='hi', sender_id=1, receiver_id=2)
+        self.assertEqual(message.chat_id, 1)
+        self.assertEqual(db.session.execute(select(func.count()).select_from(chats)).scalar(), 1)
+
     def test_delete_messages(self):
         users = init_users(3)
         m1 = Message(text='blabla', sender_id=2, receiver_id=1)
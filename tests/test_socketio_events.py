@@ -1,54 +1,37 @@
 import time
-import unittest
 from datetime import datetime
 from typing import Tuple
 
 from flask.testing import FlaskClient
 from flask_socketio import SocketIOTestClient
-from sqlalchemy import select
+from sqlalchemy import func, select
 
 from app import db
-from app import make_app
 from app import socket_io
-from app.authentication.models import chats, User
+from app.authentication.models import chats, chat_ids_cache, User
 from app.chats import Message
-from app.config import TestConfig
-
-
-class SocketIOEventsTestCase(unittest.TestCase):
-    def setUp(self) -> None:
-        self.events_namespace = '/chats/going'
-        self.app = make_app(TestConfig)
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
-        db.create_all()
-
-    def tearDown(self) -> None:
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
+from tests import AppTestCase, get_test_password_hash
+
+
+class SocketIOEventsTestCase(AppTestCase):
+    events_namespace = '/chats/going'
 
     @staticmethod
-    def init_two_clients(client1: FlaskClient, client2: FlaskClient):
+    def add_users(*numbers: int):
+        """Inserts users with given numbers in emails, usernames and names directly, without the registration"""
+        db.session.add_all(User(email=f'test{number}@gmail.com', username=f'test_user{number}', name=f'Ann{number}',
+                                password_hash=get_test_password_hash('Who am I')) for number in numbers)
+        db.session.commit()
+
+    def init_two_clients(self, client1: FlaskClient, client2: FlaskClient):
         """Initializes two given clients for the next actions with socketio events: fills in their sessions with
         necessary information.
         :param client1: the first flask test client instance
         :param client2: the second one"""
-        client1.post('/authentication/register',
-                     data={'email': 'test1@gmail.com', 'username': 'test_user1',
-                           'name': 'Ann1', 'password1': 'Who am I', 'password2': 'Who am I'},
-                     follow_redirects=True)
+        self.add_users(1, 2)
         client1.post('/authentication/login', data={'email': 'test1@gmail.com',
                                                     'password': 'Who am I'},
                      follow_redirects=True)
-        client2.post('/authentication/register',
-                     data={'email': 'test2@gmail.com', 'username': 'test_user2',
-                           'name': 'Ann2', 'password1': 'Who am I', 'password2': 'Who am I'},
-                     follow_redirects=True)
         client2.post('/authentication/login', data={'email': 'test2@gmail.com',
                                                     'password': 'Who am I'})
         client1.get('/chats/begin/test_user2')
@@ -169,33 +152,27 @@ class SocketIOEventsTestCase(unittest.TestCase):
             socket_io_client1.emit('enter_room', namespace=self.events_namespace)
             socket_io_client2.emit('enter_room', namespace=self.events_namespace)
 
-            result = db.session.execute(select(chats))
-            self.assertEqual(len(result.all()), 0)
-            result.close()
+            self.assertEqual(db.session.execute(select(func.count()).select_from(chats)).scalar(), 0)
             self.assertFalse(User.is_chat_between(1, 2))
-            self.assertEqual(User.is_chat_between.cache_info().currsize, 1)
+            self.assertEqual(chat_ids_cache, {(1, 2): None})
 
             socket_io_client1.emit('put_data',
                                    {'message': 'test_message', 'timestamp_milliseconds': time.time() * 1000},
                                    namespace=self.events_namespace)
-            self.assertEqual(User.is_chat_between.cache_info().currsize, 0)
-            result = db.session.execute(select(chats))
-            self.assertEqual(len(result.all()), 1)
-            result.close()
+            self.assertEqual(chat_ids_cache, {(1, 2): 1})
+            self.assertEqual(db.session.execute(select(func.count()).select_from(chats)).scalar(), 1)
             self.assertTrue(User.is_chat_between(1, 2))
             self.assertTrue(User.is_chat_between(2, 1))
-            self.assertEqual(User.is_chat_between.cache_info().currsize, 2)
-            User.is_chat_between.cache_clear()
+            self.assertEqual(len(chat_ids_cache), 1)
+            chat_ids_cache.clear()
             self.assertTrue(User.is_chat_between(1, 2))
             socket_io_client2.emit('put_data',
                                    {'message': 'test_message2', 'timestamp_milliseconds': time.time() * 1000},
                                    namespace=self.events_namespace)
-            self.assertEqual(User.is_chat_between.cache_info().currsize, 2)
-            result = db.session.execute(select(chats))
-            self.assertEqual(len(result.all()), 1)
-            result.close()
+            self.assertEqual(chat_ids_cache, {(1, 2): 1})
+            self.assertEqual(db.session.execute(select(func.count()).select_from(chats)).scalar(), 1)
             self.assertTrue(User.is_chat_between(2, 1))
-            self.assertEqual(User.is_chat_between.cache_info().currsize, 2)
+            self.assertEqual(len(chat_ids_cache), 1)
 
     def test_get_more_messages(self):
         messages_limit = self.app.config['MESSAGES_PER_LOAD_EVENT']
@@ -252,10 +229,7 @@ class SocketIOEventsTestCase(unittest.TestCase):
         with self.app.test_client() as client1, self.app.test_client() as client2, self.app.test_client() as client3:
             self.init_two_clients(client1, client2)
 
-            client3.post('/authentication/register',
-                         data={'email': 'test3@gmail.com', 'username': 'test_user3',
-                               'name': 'Ann3', 'password1': 'Who am I', 'password2': 'Who am I'},
-                         follow_redirects=True)
+            self.add_users(3)
             client3.post('/authentication/login', data={'email': 'test3@gmail.com',
                                                         'password': 'Who am I'},
                          follow_redirects=True)
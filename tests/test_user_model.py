@@ -1,206 +1,353 @@
 import os
-import time
-import unittest
 from typing import List
 
+import pytest
+from eventlet import patcher, tpool
+from freezegun import freeze_time
 from itsdangerous.exc import SignatureExpired, BadSignature
-from sqlalchemy.sql import select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import func, select
+from werkzeug.security import generate_password_hash
 
 from app import db
 from app import mail
-from app import make_app
 from app.authentication import User
 from app.authentication.exceptions import UserNotFoundByIndexError
-from app.authentication.models import chats
+from app.authentication.models import authentication_tokens_cache, chats, chat_ids_cache, login_credentials_cache
+from app.authentication.models import logged_in_users_cache
 from app.chats.exceptions import ChatAlreadyExistsError, ChatNotFoundByIndexesError
-from app.config import TestConfig
 
+pytestmark = pytest.mark.usefixtures('db_session')
 
-def init_users(number) -> List[User]:
-    """Returns given number of users with sequent emails and usernames"""
-    users = []
-    for i in range(1, number + 1):
-        users.append(User(email=f'user{i}@gmail.com', username=f'user{i}', name=f'name{i}', password_hash='123'))
+PASSWORD_HASH = '123'
+
+
+def init_users(number, commit=False) -> List[User]:
+    """Returns given number of users with sequent emails and usernames. If commit is true, the users are inserted by one
+    bulk statement, which skips the unit of work bookkeeping, and the persistent ones are loaded back in their order"""
+    users = [User(email=f'user{i}@gmail.com', username=f'user{i}', name=f'name{i}',
+                  password_hash=PASSWORD_HASH) for i in range(1, number + 1)]
+    if commit:
+        db.session.bulk_save_objects(users)
+        db.session.commit()
+        users = User.query.filter(User.email.in_([user.email for user in users])).order_by(User.user_id).all()
     return users
 
 
-class UserModelTestCase(unittest.TestCase):
-    """Tests for main user model"""
+def test_get_user_by_id():
+    user1, user2 = init_users(2, commit=True)
+    assert User.get_user_by_id(1) == user1
+    assert User.get_user_by_id(2) == user2
+    with pytest.raises(UserNotFoundByIndexError):
+        User.get_user_by_id(3)
 
-    def setUp(self) -> None:
-        self.app = make_app(TestConfig)
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
-        db.create_all()
 
-    def tearDown(self) -> None:
-        User.is_chat_between.cache_clear()
-        User.get_chat_id_by_users_ids.cache_clear()
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
+def test_password_not_readable():
+    user, = init_users(1)
+    with pytest.raises(AttributeError):
+        _ = user.password
 
-    def test_get_user_by_id(self):
-        user1, user2 = init_users(2)
-        db.session.add_all([user1, user2])
-        db.session.commit()
-        self.assertEqual(User.get_user_by_id(1), user1)
-        self.assertEqual(User.get_user_by_id(2), user2)
-        with self.assertRaises(UserNotFoundByIndexError):
-            User.get_user_by_id(3)
-
-    def test_password_not_readable(self):
-        user, = init_users(1)
-        with self.assertRaises(AttributeError):
-            _ = user.password
-
-    def test_user_repr(self):
-        user, = init_users(1)
-        self.assertEqual(user.__repr__(), 'User - user1')
-
-    def test_set_password(self):
-        user, = init_users(1)
-        user.set_password('1234')
-        self.assertIsNotNone(user.password_hash)
-
-    def test_no_password_attribute(self):
-        user, = init_users(1)
-        user.set_password('1234')
-        with self.assertRaises(AttributeError):
-            print(user.password)
-
-    def test_verify_password(self):
-        user, = init_users(1)
-        for _ in range(5):
-            temp_password = os.urandom(10).decode('latin1')
-            user.set_password(temp_password)
-            self.assertTrue(user.verify_password(temp_password))
-            self.assertFalse(user.verify_password('Impossible string???'))
-
-    def test_password_salt(self):
-        user1, user2 = init_users(2)
-        password = os.urandom(10).decode('latin1')
-        user1.set_password(password)
-        user2.set_password(password)
-        self.assertNotEqual(user1.password_hash, user2.password_hash)
-
-    def test_send_mail(self):
-        user1, user2 = init_users(2)
-        db.session.add_all([user1, user2])
-        db.session.commit()
-        with mail.record_messages() as records:
-            user1.send_email(subject='Testing_subject1', text='testing_text1')
-            user2.send_email(subject='Testing_subject2', text='testing_text2')
-            self.assertEqual(len(records), 2)
-            self.assertEqual(records[0].subject, 'Testing_subject1')
-            self.assertEqual(records[0].body, 'testing_text1')
-            self.assertEqual(records[1].subject, 'Testing_subject2')
-            self.assertEqual(records[1].body, 'testing_text2')
-
-    def test_reset_password_token(self):
-        user1, user2 = init_users(2)
-        db.session.add_all([user1, user2])
-        db.session.commit()
-        token1 = user1.get_reset_password_token()
-        token2 = user2.get_reset_password_token()
-        self.assertEqual(user1, User.get_user_by_reset_password_token(token1))
-        self.assertEqual(user2, User.get_user_by_reset_password_token(token2))
-
-    def test_expired_password_token(self):
-        user, = init_users(1)
-        db.session.add(user)
-        db.session.commit()
-        token = user.get_reset_password_token(1)
-        time.sleep(2)
-        with self.assertRaises(SignatureExpired):
-            User.get_user_by_reset_password_token(token)
 
-    def test_bad_signature_password_token(self):
-        user, = init_users(1)
-        db.session.add(user)
-        db.session.commit()
-        token = user.get_reset_password_token()
-        token = token[:10]
-        with self.assertRaises(BadSignature):
+def test_user_repr():
+    user, = init_users(1)
+    assert user.__repr__() == 'User - user1'
+
+
+def test_set_password():
+    user, = init_users(1)
+    user.set_password('1234')
+    assert user.password_hash is not None
+
+
+def test_no_password_attribute():
+    user, = init_users(1)
+    user.set_password('1234')
+    with pytest.raises(AttributeError):
+        print(user.password)
+
+
+def test_verify_password():
+    user, = init_users(1)
+    temp_password = os.urandom(10).decode('latin1')
+    user.set_password(temp_password)
+    assert user.verify_password(temp_password)
+    assert not user.verify_password('Impossible string???')
+
+
+def test_hash_password():
+    user, = init_users(1)
+    user.password_hash = User.hash_password('1234')
+    assert user.verify_password('1234')
+    assert not user.verify_password('4321')
+
+
+def test_hash_password_off_event_loop(monkeypatch):
+    """Under eventlet argon2 runs in its pool of OS threads, so the event loop is not blocked"""
+    calls = []
+    monkeypatch.setattr(patcher, 'is_monkey_patched', lambda module: True)
+    monkeypatch.setattr(tpool, 'execute', lambda func, *args: calls.append(func) or func(*args))
+    user, = init_users(1)
+    user.set_password('1234')
+    assert user.verify_password('1234')
+    assert len(calls) == 2
+
+
+@pytest.mark.slow
+def test_verify_legacy_password_hash():
+    user, = init_users(1)
+    user.password_hash = generate_password_hash('1234')
+    assert not user.verify_password('4321')
+    assert user.password_hash.startswith('pbkdf2:')
+    assert user.verify_password('1234')
+    assert user.password_hash.startswith('$argon2')
+    assert user.verify_password('1234')
+
+
+def test_verify_password_rehash(app):
+    user, = init_users(1)
+    user.set_password('1234')
+    old_hash = user.password_hash
+    assert user.verify_password('1234')
+    assert user.password_hash == old_hash
+    app.config['ARGON2_TIME_COST'] += 1
+    try:
+        assert user.verify_password('1234')
+        assert user.password_hash != old_hash
+        assert user.verify_password('1234')
+    finally:
+        app.config['ARGON2_TIME_COST'] -= 1
+    # a hash made with a higher cost is not weakened
+    stronger_hash = user.password_hash
+    assert user.verify_password('1234')
+    assert user.password_hash == stronger_hash
+
+
+def test_get_logged_in_user():
+    user1, = init_users(1, commit=True)
+    db.session.expunge_all()
+    fetched_user = User.get_logged_in_user(1)
+    assert fetched_user.username == 'user1'
+    assert logged_in_users_cache[1] == {'user_id': 1, 'username': 'user1', 'email': 'user1@gmail.com',
+                                        'name': 'name1', 'date_joined': fetched_user.date_joined}
+    # a cached user is a new instance attached to the session of the request, its other columns are loaded lazily
+    db.session.expunge_all()
+    cached_user = User.get_logged_in_user(1)
+    assert cached_user is not fetched_user
+    assert cached_user in db.session
+    assert cached_user.username == 'user1'
+    assert cached_user.password_hash == PASSWORD_HASH
+    assert User.get_logged_in_user(1) is cached_user
+
+
+def test_get_login_credentials():
+    user1, user2 = init_users(2, commit=True)
+    assert User.get_login_credentials('user1@gmail.com') == (1, PASSWORD_HASH)
+    assert User.get_login_credentials('user3@gmail.com') is None
+    assert login_credentials_cache == {'user1@gmail.com': (1, PASSWORD_HASH)}
+    User.forget_login_credentials('user1@gmail.com')
+    assert login_credentials_cache == {}
+
+
+@pytest.mark.slow
+def test_verify_dummy_password():
+    assert User.verify_dummy_password('1234') is None
+    assert User.verify_password_hash(generate_password_hash('1234'), '1234') == (True, True)
+    assert User.verify_password_hash('123', '1234') == (False, False)
+
+
+def test_password_salt():
+    user1, user2 = init_users(2)
+    password = os.urandom(10).decode('latin1')
+    user1.set_password(password)
+    user2.set_password(password)
+    assert user1.password_hash != user2.password_hash
+
+
+@pytest.mark.slow
+def test_send_mail():
+    user1, user2 = init_users(2, commit=True)
+    with mail.record_messages() as records:
+        user1.send_email(subject='Testing_subject1', text='testing_text1')
+        user2.send_email(subject='Testing_subject2', text='testing_text2')
+        assert len(records) == 2
+        assert records[0].subject == 'Testing_subject1'
+        assert records[0].body == 'testing_text1'
+        assert records[1].subject == 'Testing_subject2'
+        assert records[1].body == 'testing_text2'
+
+
+def test_reset_password_token():
+    user, = init_users(1, commit=True)
+    token = user.get_reset_password_token()
+    assert user == User.get_user_by_reset_password_token(token)
+
+
+def test_expired_password_token():
+    user, = init_users(1, commit=True)
+    with freeze_time() as frozen_time:
+        token = user.get_reset_password_token(1)
+        frozen_time.tick(2)
+        with pytest.raises(SignatureExpired):
             User.get_user_by_reset_password_token(token)
 
-    def test_users_create_delete_chat(self):
-        user1, user2 = init_users(2)
-        db.session.add_all([user1, user2, ])
-        db.session.commit()
 
-        with self.assertRaises(ChatNotFoundByIndexesError):
-            User.delete_chat(two_users_ids=[1, 2])
+@pytest.mark.parametrize('spoil', [lambda token: token[:10], lambda token: token[:-1], lambda token: token + 'blabla'],
+                         ids=['truncated', 'last_char_cut', 'appended'])
+def test_bad_signature_password_token(spoil):
+    user, = init_users(1, commit=True)
+    token = user.get_reset_password_token()
+    with pytest.raises(BadSignature):
+        User.get_user_by_reset_password_token(spoil(token))
 
-        self.assertFalse(User.is_chat_between(1, 2))
-        self.assertFalse(User.is_chat_between(2, 1))
-        result = db.session.execute(select(chats))
-        self.assertEqual(len(result.all()), 0)
-        result.close()
 
-        User.create_chat(1, 2)
-        db.session.commit()
-        with self.assertRaises(ChatAlreadyExistsError):
-            User.create_chat(2, 1)
-        self.assertTrue(User.is_chat_between(1, 2))
-        self.assertTrue(User.is_chat_between(2, 1))
-        result = db.session.execute(select(chats))
-        self.assertEqual(result.all()[0], (1, 1, 2))
-        result.close()
+def test_users_create_delete_chat():
+    user1, user2 = init_users(2, commit=True)
 
+    with pytest.raises(ChatNotFoundByIndexesError):
         User.delete_chat(two_users_ids=[1, 2])
+
+    assert not User.is_chat_between(1, 2)
+    assert not User.is_chat_between(2, 1)
+    assert db.session.execute(select(func.count()).select_from(chats)).scalar() == 0
+
+    User.create_chat(1, 2)
+    db.session.flush()
+    with pytest.raises(ChatAlreadyExistsError):
         User.create_chat(2, 1)
-        db.session.commit()
-        self.assertTrue(User.is_chat_between(1, 2))
-        self.assertTrue(User.is_chat_between(2, 1))
-        result = db.session.execute(select(chats))
-        self.assertEqual(result.all()[0], (1, 1, 2))
-        result.close()
+    assert User.is_chat_between(1, 2)
+    assert User.is_chat_between(2, 1)
+    assert db.session.execute(select(chats)).first() == (1, 1, 2)
 
-        User.delete_chat(chat_id=1)
-        db.session.commit()
-        self.assertFalse(User.is_chat_between(1, 2))
-        self.assertFalse(User.is_chat_between(2, 1))
-        result = db.session.execute(select(chats))
-        self.assertEqual(len(result.all()), 0)
-        result.close()
-
-    def test_get_chat_id_by_users_ids(self):
-        db.session.add_all(init_users(3))
-        db.session.commit()
-        with self.assertRaises(ChatNotFoundByIndexesError):
-            User.get_chat_id_by_users_ids(1, 2)
-        with self.assertRaises(ChatNotFoundByIndexesError):
-            User.get_chat_id_by_users_ids(2, 1)
-        User.create_chat(1, 2)
-        User.create_chat(2, 3)
-        db.session.commit()
-        self.assertTrue(User.get_chat_id_by_users_ids(1, 2) == User.get_chat_id_by_users_ids(2, 1))
-        self.assertTrue(User.get_chat_id_by_users_ids(2, 3) == User.get_chat_id_by_users_ids(3, 2))
-        with self.assertRaises(ChatNotFoundByIndexesError):
-            User.get_chat_id_by_users_ids(1, 3)
-        User.delete_chat(two_users_ids=[3, 2])
-        User.delete_chat(two_users_ids=[2, 1])
-        db.session.commit()
-        with self.assertRaises(ChatNotFoundByIndexesError):
-            User.get_chat_id_by_users_ids(2, 3)
-        with self.assertRaises(ChatNotFoundByIndexesError):
-            User.get_chat_id_by_users_ids(1, 2)
-
-    def test_authentication_token(self):
-        user, = init_users(1)
-        db.session.add(user)
-        db.session.commit()
-        token = user.get_authentication_token()
-        self.assertEqual(user, User.get_user_by_authentication_token(token))
+    User.delete_chat(two_users_ids=[1, 2])
+    User.create_chat(2, 1)
+    db.session.flush()
+    assert User.is_chat_between(1, 2)
+    assert User.is_chat_between(2, 1)
+    assert db.session.execute(select(chats)).first() == (1, 1, 2)
+
+    User.delete_chat(chat_id=1)
+    db.session.commit()
+    assert not User.is_chat_between(1, 2)
+    assert not User.is_chat_between(2, 1)
+    assert db.session.execute(select(func.count()).select_from(chats)).scalar() == 0
+
+
+def test_create_existing_chat_not_cached():
+    db.session.add_all(init_users(3))
+    User.create_chat(1, 2)
+    db.session.commit()
+    chat_ids_cache.clear()
+    with pytest.raises(ChatAlreadyExistsError):
+        User.create_chat(2, 1)
+    assert chat_ids_cache == {(1, 2): 1}
+    User.create_chat(3, 2)
+    db.session.commit()
+    result = db.session.execute(select(chats))
+    assert result.all() == [(1, 1, 2), (2, 2, 3)]
+    result.close()
+
+
+def test_get_chat_id_by_users_ids():
+    init_users(3, commit=True)
+    with pytest.raises(ChatNotFoundByIndexesError):
+        User.get_chat_id_by_users_ids(1, 2)
+    with pytest.raises(ChatNotFoundByIndexesError):
+        User.get_chat_id_by_users_ids(2, 1)
+    User.create_chat(1, 2)
+    User.create_chat(2, 3)
+    db.session.commit()
+    assert User.get_chat_id_by_users_ids(1, 2) == User.get_chat_id_by_users_ids(2, 1)
+    assert User.get_chat_id_by_users_ids(2, 3) == User.get_chat_id_by_users_ids(3, 2)
+    with pytest.raises(ChatNotFoundByIndexesError):
+        User.get_chat_id_by_users_ids(1, 3)
+    User.delete_chat(two_users_ids=[3, 2])
+    User.delete_chat(two_users_ids=[2, 1])
+    db.session.commit()
+    with pytest.raises(ChatNotFoundByIndexesError):
+        User.get_chat_id_by_users_ids(2, 3)
+    with pytest.raises(ChatNotFoundByIndexesError):
+        User.get_chat_id_by_users_ids(1, 2)
+
+
+def test_get_chat_id_or_none():
+    init_users(3, commit=True)
+    assert User.get_chat_id_or_none(2, 1) is None
+    assert chat_ids_cache == {(1, 2): None}
+    User.create_chat(1, 2)
+    db.session.commit()
+    assert chat_ids_cache == {(1, 2): 1}
+    assert User.get_chat_id_or_none(1, 2) == 1
+    assert User.get_chat_id_or_none(2, 1) == 1
+    assert User.get_chat_id_or_none(3, 2) is None
+    assert len(chat_ids_cache) == 2
+    User.delete_chat(chat_id=1)
+    db.session.commit()
+    assert chat_ids_cache == {(2, 3): None}
+
+
+def test_chats_between_many():
+    init_users(4, commit=True)
+    User.create_chat(1, 2)
+    User.create_chat(3, 1)
+    db.session.commit()
+    chat_ids_cache.clear()
+    assert User.get_chat_id_or_none(1, 2) == 1
+    assert User.chats_between_many(1, [2, 3, 4]) == {2: 1, 3: 2, 4: None}
+    assert chat_ids_cache == {(1, 2): 1, (1, 3): 2, (1, 4): None}
+    assert User.chats_between_many(3, [1, 2]) == {1: 2, 2: None}
+    assert User.chats_between_many(1, []) == {}
+
+
+def test_create_chats_bulk():
+    init_users(4, commit=True)
+    assert User.create_chats_bulk([]) == {}
+    assert not User.is_chat_between(1, 2)
+    assert User.create_chats_bulk([(2, 1), (1, 3), (1, 2), (4, 3)]) == {(1, 2): 1, (1, 3): 2, (3, 4): 3}
+    db.session.commit()
+    assert chat_ids_cache == {(1, 2): 1, (1, 3): 2, (3, 4): 3}
+    with pytest.raises(ChatAlreadyExistsError):
+        User.create_chats_bulk([(2, 4), (2, 1)])
+    chat_ids_cache.clear()
+    with pytest.raises(ChatAlreadyExistsError):
+        User.create_chats_bulk([(2, 4), (2, 1)])
+    db.session.commit()
+    result = db.session.execute(select(chats))
+    assert result.all() == [(1, 1, 2), (2, 1, 3), (3, 3, 4)]
+    result.close()
+
+
+def test_chat_partners():
+    db.session.add_all(init_users(4))
+    User.create_chat(1, 2)
+    User.create_chat(3, 2)
+    db.session.commit()
+    user1, user2, user3, user4 = User.query.options(selectinload(User.lower_chat_partners),
+                                                    selectinload(User.higher_chat_partners)).order_by(
+        User.user_id).all()
+    assert user2.chat_partners == [user1, user3]
+    assert user1.higher_chat_partners == [user2]
+    assert user3.lower_chat_partners == [user2]
+    assert user4.chat_partners == []
+    with pytest.raises(InvalidRequestError):
+        _ = user1.messages_sent
+
+
+def test_authentication_token():
+    user, = init_users(1, commit=True)
+    token = user.get_authentication_token()
+    assert user == User.get_user_by_authentication_token(token)
+    assert user == User.get_user_by_authentication_token(token)
+    assert len(authentication_tokens_cache) == 1
 
-        token_modified = token + 'blabla'
-        with self.assertRaises(BadSignature):
-            User.get_user_by_authentication_token(token_modified)
+    token_modified = token + 'blabla'
+    with pytest.raises(BadSignature):
+        User.get_user_by_authentication_token(token_modified)
+    assert len(authentication_tokens_cache) == 1
 
+    with freeze_time() as frozen_time:
         token_expired = user.get_authentication_token(expires_in=1)
-        time.sleep(2)
-        with self.assertRaises(SignatureExpired):
+        assert user == User.get_user_by_authentication_token(token_expired)
+        frozen_time.tick(2)
+        with pytest.raises(SignatureExpired):
             User.get_user_by_authentication_token(token_expired)
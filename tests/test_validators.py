@@ -2,6 +2,8 @@ import os
 import random
 import unittest
 
+import pytest
+
 from app import make_app
 from app.authentication.exceptions import ValidationError
 from app.authentication.validators import validate_length
@@ -64,6 +66,7 @@ class ValidatorsTestCase(unittest.TestCase):
         except ValidationError:
             self.fail('ValidationError must not have been raised')
 
+    @pytest.mark.slow
     def test_validate_email(self):
         valid_emails = ['dprice@msn.com', 'staikos@optonline.net', 'psharpe@mac.com', 'andale@yahoo.com',
                         'magusnet@icloud.com', 'hillct@verizon.net', 'dunstan@att.net', 'tmccarth@sbcglobal.net', ]